@@ -1,10 +1,15 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import os
+import threading
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from . import schemas, database, models
+from .cache import TTLCache
 from sqlalchemy.orm import Session
 
 SECRET_KEY = "SECRET_KEY_GOES_HERE" # In prod use env var
@@ -13,16 +18,72 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hashed password"""
+# ─── Password hashing pool ───────────────────────────────────────────────────
+# bcrypt is CPU-bound and deliberately slow. All hashing runs on a small dedicated
+# pool so a burst of logins cannot occupy every request thread or core; once
+# PASSWORD_MAX_PENDING jobs are queued or running, new ones get a 503.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "16"))
+
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+_password_stats = {"pending": 0, "completed": 0, "rejected": 0}
+_password_stats_lock = threading.Lock()
+
+def _bcrypt_verify(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
-def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+def _bcrypt_hash(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+def _password_job_done(_future):
+    with _password_stats_lock:
+        _password_stats["pending"] -= 1
+        _password_stats["completed"] += 1
+    _password_slots.release()
+
+def _submit_password_job(fn, *args) -> Future:
+    if not _password_slots.acquire(blocking=False):
+        with _password_stats_lock:
+            _password_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress. Please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    with _password_stats_lock:
+        _password_stats["pending"] += 1
+    future = _password_pool.submit(fn, *args)
+    future.add_done_callback(_password_job_done)
+    return future
+
+def password_pool_stats() -> dict:
+    """Queue depth and counters for the password hashing pool"""
+    with _password_stats_lock:
+        stats = dict(_password_stats)
+    stats.update(workers=PASSWORD_WORKERS, max_pending=PASSWORD_MAX_PENDING, bcrypt_rounds=BCRYPT_ROUNDS)
+    return stats
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hashed password (blocks the calling thread until the pool finishes)"""
+    return _submit_password_job(_bcrypt_verify, plain_password, hashed_password).result()
+
+def get_password_hash(password: str) -> str:
+    """Hash a password using bcrypt (blocks the calling thread until the pool finishes)"""
+    return _submit_password_job(_bcrypt_hash, password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the pool without holding a request thread"""
+    return await asyncio.wrap_future(_submit_password_job(_bcrypt_verify, plain_password, hashed_password))
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the pool without holding a request thread"""
+    return await asyncio.wrap_future(_submit_password_job(_bcrypt_hash, password))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,6 +94,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class Principal:
+    """The authenticated user's identity, detached from any DB session so it can be cached across requests"""
+    __slots__ = ("id", "username", "role", "organization_id")
+
+    def __init__(self, id: int, username: str, role: str, organization_id: Optional[int]):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.organization_id = organization_id
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.username, user.role, user.organization_id)
+
+# Per-process; each worker re-validates against the DB at most once per TTL
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+)
+
+def invalidate_principal(user_id: int):
+    """Drop a cached principal. Call after deleting a user or changing their password, role or organization."""
+    principal_cache.invalidate(user_id)
+
+def create_user_token(user: models.User) -> str:
+    """Access token carrying the user id, used as the principal_cache key.
+
+    Organization and role are always read from the cached principal (or the DB on a
+    miss), never from the token, so deletes and role changes apply within the cache TTL.
+    """
+    return create_access_token(
+        data={"sub": user.username, "role": user.role, "uid": user.id},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,17 +139,29 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         role: str = payload.get("role")
+        user_id: Optional[int] = payload.get("uid")
         if username is None:
             raise credentials_exception
         token_data = schemas.TokenData(username=username, role=role)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
+
+    principal = principal_cache.get(user_id) if user_id is not None else None
+    if principal is None:
+        if user_id is not None:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+        else:
+            # Tokens issued before uid was added to the claims
+            user = db.query(models.User).filter(models.User.username == token_data.username).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(principal.id, principal)
+    if principal.username != token_data.username:
         raise credentials_exception
-    return user
+    return principal
 
-def get_current_active_owner(current_user: models.User = Depends(get_current_user)):
+def get_current_active_owner(current_user: Principal = Depends(get_current_user)):
     if current_user.role != "owner":
         raise HTTPException(status_code=403, detail="Not authorized")
     return current_user
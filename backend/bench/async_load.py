@@ -0,0 +1,205 @@
+"""
+Load benchmark for the read endpoints ported to async (analytics, listings, inbox).
+
+Three steps, each run from the repository root with the same DATABASE_URL:
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m backend.bench.async_load seed
+    DATABASE_URL=sqlite:////tmp/bench.db DB_ASYNC=true python -m backend.bench.async_load serve --delay-ms 10
+    python -m backend.bench.async_load load --concurrency 20,100,300 --duration 15
+
+`serve` runs one uvicorn worker. Compare DB_ASYNC=false (async handlers on the sync pool
+via ThreadedSession) with DB_ASYNC=true, or run `serve` from a checkout before the async
+port to measure the old sync handlers against the same seeded database.
+
+--delay-ms adds a sleep before every SQLite statement on the driver's thread, standing
+in for a network round trip to a database server. Leave it at 0 on PostgreSQL. Do not
+use a "localhost" DATABASE_URL here (use 127.0.0.1): main.py treats it as development
+and drops every table on startup.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+OWNER = ("bench-owner", "bench-pw")
+PATHS = [
+    "/analytics/top-products?days=30",
+    "/analytics/attendance/daily?days=30",
+    "/analytics/staff-performance",
+    "/pos/sale/all?limit=50",
+    "/message/unread-count",
+    "/attendance/all?limit=50",
+]
+
+def seed(staff: int, sales: int, days: int, messages: int):
+    from backend import auth, database, models, rollups
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        if db.query(models.User).filter(models.User.username == OWNER[0]).first():
+            raise SystemExit(f"{OWNER[0]} already exists; seed an empty database")
+        now = datetime.utcnow()
+        owner = models.User(username=OWNER[0], password_hash=auth.get_password_hash(OWNER[1]), role="owner")
+        db.add(owner)
+        db.flush()
+        org = models.Organization(name="Bench Shop", owner_id=owner.id)
+        db.add(org)
+        db.flush()
+        owner.organization_id = org.id
+
+        members = [
+            models.User(username=f"bench-staff-{i}", password_hash="-", role="staff",
+                        organization_id=org.id, created_at=now - timedelta(days=i))
+            for i in range(staff)
+        ]
+        products = [
+            models.Product(organization_id=org.id, name=f"Product {i}", sku=f"BENCH-{i}", price=10 + i, cost=5, stock=100)
+            for i in range(200)
+        ]
+        db.add_all(members + products)
+        db.flush()
+
+        for d in range(days):
+            when = now - timedelta(days=d)
+            db.add_all(
+                models.Attendance(user_id=m.id, organization_id=org.id, date=when, day=when.date(), check_in_time=when,
+                                  status=random.choice(["Present", "Late", "Absent"]), marked_by="manual")
+                for m in members
+            )
+        for n in range(sales):
+            sale = models.Sale(organization_id=org.id, customer_name="Walk-in", sold_by=owner.id, subtotal=20, discount=0,
+                               tax=0, total=20, payment_method="cash", created_at=now - timedelta(minutes=7 * n))
+            sale.items = [models.SaleItem(product_id=random.choice(products).id, quantity=2, unit_price=10, subtotal=20)]
+            db.add(sale)
+        db.add_all(
+            models.Message(sender_id=owner.id, receiver_id=owner.id, organization_id=org.id, message=f"Message {n}",
+                           type="info", timestamp=now - timedelta(minutes=n))
+            for n in range(messages)
+        )
+        db.commit()
+        rollups.rebuild_daily_sales(db, org.id)
+        print(f"Seeded {staff} staff, {sales} sales, {staff * days} attendance rows, {messages} messages")
+    finally:
+        db.close()
+
+def _simulate_latency(delay_ms: float):
+    """Sleep before every sqlite3 statement, on whichever thread runs the driver"""
+    import sqlite3
+
+    delay = delay_ms / 1000
+
+    class Cursor(sqlite3.Cursor):
+        def execute(self, *args, **kwargs):
+            time.sleep(delay)
+            return super().execute(*args, **kwargs)
+
+        def executemany(self, *args, **kwargs):
+            time.sleep(delay)
+            return super().executemany(*args, **kwargs)
+
+    class Connection(sqlite3.Connection):
+        def cursor(self, factory=Cursor):
+            return super().cursor(factory)
+
+        def execute(self, *args, **kwargs):
+            time.sleep(delay)
+            return super().execute(*args, **kwargs)
+
+    connect = sqlite3.connect
+
+    def slow_connect(*args, **kwargs):
+        kwargs.setdefault("factory", Connection)
+        return connect(*args, **kwargs)
+
+    sqlite3.connect = slow_connect
+
+def serve(port: int, delay_ms: float):
+    url = os.getenv("DATABASE_URL", "")
+    if not url or "localhost" in url:
+        raise SystemExit("Set DATABASE_URL to the seeded database (not 'localhost'; see the module docstring)")
+    if delay_ms:
+        # Before the app (and its engines) are imported
+        _simulate_latency(delay_ms)
+    import uvicorn
+    uvicorn.run("backend.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+async def _run_level(base_url: str, concurrency: int, duration: float, report: bool = True):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        r = await client.post("/auth/login", data={"username": OWNER[0], "password": OWNER[1]})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        latencies, probes, errors = [], [], 0
+        deadline = time.perf_counter() + duration
+
+        async def worker(n: int):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    ok = (await client.get(PATHS[n % len(PATHS)], headers=headers)).status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+                n += 1
+
+        async def probe():
+            # /health latency under load: how long a trivial request queues
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    await client.get("/health")
+                    probes.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)), probe())
+
+    def pct(values, p):
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000) if values else None
+
+    if not report:
+        return
+    print(f"conc={concurrency} rps={len(latencies) / duration:.0f} p50={pct(latencies, .5)}ms "
+          f"p95={pct(latencies, .95)}ms p99={pct(latencies, .99)}ms errors={errors} "
+          f"health_p50={pct(probes, .5)}ms health_p95={pct(probes, .95)}ms")
+
+def load(base_url: str, levels: list, duration: float):
+    asyncio.run(_run_level(base_url, 5, 3, report=False))  # warm-up: principal cache, pool connections
+    for concurrency in levels:
+        asyncio.run(_run_level(base_url, concurrency, duration))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("seed", help="create tables and load benchmark data into DATABASE_URL")
+    p.add_argument("--staff", type=int, default=50)
+    p.add_argument("--sales", type=int, default=20000)
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--messages", type=int, default=2000)
+    p = commands.add_parser("serve", help="run the API (one uvicorn worker)")
+    p.add_argument("--port", type=int, default=8790)
+    p.add_argument("--delay-ms", type=float, default=0, help="simulated per-statement latency (SQLite only)")
+    p = commands.add_parser("load", help="drive a running server")
+    p.add_argument("--url", default="http://127.0.0.1:8790")
+    p.add_argument("--concurrency", default="20,100,300", help="comma-separated client counts")
+    p.add_argument("--duration", type=float, default=15, help="seconds per level")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed(args.staff, args.sales, args.days, args.messages)
+    elif args.command == "serve":
+        serve(args.port, args.delay_ms)
+    else:
+        load(args.url, [int(c) for c in args.concurrency.split(",")], args.duration)
+
+if __name__ == "__main__":
+    main()
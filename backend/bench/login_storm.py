@@ -0,0 +1,177 @@
+"""
+Login storm benchmark: checkout and product-list latency while many clients log in at once.
+
+Three steps, each run from the repository root with the same DATABASE_URL:
+
+    DATABASE_URL=sqlite:////tmp/storm.db python -m backend.bench.login_storm seed
+    DATABASE_URL=sqlite:////tmp/storm.db python -m backend.bench.login_storm serve
+    python -m backend.bench.login_storm load --logins 50,200 --duration 15
+
+Then restart `serve --no-pool` and run `load` again. With the pool, bcrypt runs on
+PASSWORD_WORKERS dedicated threads and excess logins get a 503; with --no-pool every
+check runs inline on the request threadpool with no cap, as the sync login handler did,
+so it competes with the sync /pos/sale and /pos/product/all handlers for threads and cores.
+
+Use a production BCRYPT_ROUNDS (the default 12) on both runs. Do not use a "localhost"
+DATABASE_URL here (use 127.0.0.1): main.py treats it as development and drops every
+table on startup.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+OWNER = ("bench-owner", "bench-pw")
+STAFF_PASSWORD = "bench-staff-pw"
+
+def seed(staff: int):
+    from backend import auth, database, models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        if db.query(models.User).filter(models.User.username == OWNER[0]).first():
+            raise SystemExit(f"{OWNER[0]} already exists; seed an empty database")
+        owner = models.User(username=OWNER[0], password_hash=auth.get_password_hash(OWNER[1]), role="owner")
+        db.add(owner)
+        db.flush()
+        org = models.Organization(name="Bench Shop", owner_id=owner.id)
+        db.add(org)
+        db.flush()
+        owner.organization_id = org.id
+
+        # One hash shared by every account: each login still pays a full bcrypt check
+        staff_hash = auth.get_password_hash(STAFF_PASSWORD)
+        db.add_all(
+            models.User(username=f"bench-staff-{i}", password_hash=staff_hash, role="staff", organization_id=org.id)
+            for i in range(staff)
+        )
+        db.add_all(
+            models.Product(organization_id=org.id, name=f"Product {i}", sku=f"BENCH-{i}", price=10 + i, cost=5,
+                           stock=1_000_000)
+            for i in range(200)
+        )
+        db.commit()
+        print(f"Seeded {staff} staff and 200 products")
+    finally:
+        db.close()
+
+def _bypass_password_pool():
+    """Run bcrypt inline on the request threadpool with no admission limit (the pre-pool behaviour)"""
+    from fastapi.concurrency import run_in_threadpool
+    from backend import auth
+
+    async def verify_password_async(plain_password, hashed_password):
+        return await run_in_threadpool(auth._bcrypt_verify, plain_password, hashed_password)
+
+    async def get_password_hash_async(password):
+        return await run_in_threadpool(auth._bcrypt_hash, password)
+
+    auth.verify_password_async = verify_password_async
+    auth.get_password_hash_async = get_password_hash_async
+
+def serve(port: int, no_pool: bool):
+    url = os.getenv("DATABASE_URL", "")
+    if not url or "localhost" in url:
+        raise SystemExit("Set DATABASE_URL to the seeded database (not 'localhost'; see the module docstring)")
+    if no_pool:
+        _bypass_password_pool()
+    import uvicorn
+    uvicorn.run("backend.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+def pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))] * 1000) if values else None
+
+async def _run_level(base_url: str, logins: int, staff: int, duration: float, report: bool = True):
+    import httpx
+
+    limits = httpx.Limits(max_connections=logins + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        r = await client.post("/auth/login", data={"username": OWNER[0], "password": OWNER[1]})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        product_ids = [p["id"] for p in (await client.get("/pos/product/all", headers=headers)).json()]
+        usernames = itertools.cycle(f"bench-staff-{i}" for i in range(staff))
+        login_latencies, checkout, listing = [], [], []
+        counts = {"ok": 0, "rejected": 0, "errors": 0}
+        deadline = time.perf_counter() + duration
+
+        async def storm():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    r = await client.post("/auth/login", data={"username": next(usernames), "password": STAFF_PASSWORD})
+                    status = r.status_code
+                except httpx.HTTPError:
+                    status = None
+                login_latencies.append(time.perf_counter() - start)
+                if status == 200:
+                    counts["ok"] += 1
+                elif status == 503:
+                    counts["rejected"] += 1
+                    await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+                else:
+                    counts["errors"] += 1
+
+        async def probe(request, latencies):
+            # A cashier's view of the storm: one request at a time, a few per second
+            n = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if (await request(n)).status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        counts["errors"] += 1
+                except httpx.HTTPError:
+                    counts["errors"] += 1
+                n += 1
+                await asyncio.sleep(0.2)
+
+        def sell(n):
+            item = {"product_id": product_ids[n % len(product_ids)], "quantity": 1}
+            return client.post("/pos/sale", json={"items": [item]}, headers=headers)
+
+        def list_products(_n):
+            return client.get("/pos/product/all", headers=headers)
+
+        await asyncio.gather(*(storm() for _ in range(logins)), probe(sell, checkout), probe(list_products, listing))
+
+    if not report:
+        return
+    print(f"logins={logins} login_rps={counts['ok'] / duration:.1f} rejected={counts['rejected']} "
+          f"errors={counts['errors']} login_p50={pct(login_latencies, .5)}ms login_p95={pct(login_latencies, .95)}ms "
+          f"sale_p50={pct(checkout, .5)}ms sale_p95={pct(checkout, .95)}ms "
+          f"products_p50={pct(listing, .5)}ms products_p95={pct(listing, .95)}ms")
+
+def load(base_url: str, levels: list, staff: int, duration: float):
+    asyncio.run(_run_level(base_url, 2, staff, 3, report=False))  # warm-up: principal cache, pool connections
+    for logins in levels:
+        asyncio.run(_run_level(base_url, logins, staff, duration))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("seed", help="create tables and load benchmark accounts into DATABASE_URL")
+    p.add_argument("--staff", type=int, default=200)
+    p = commands.add_parser("serve", help="run the API (one uvicorn worker)")
+    p.add_argument("--port", type=int, default=8791)
+    p.add_argument("--no-pool", action="store_true", help="hash inline on the request threadpool, uncapped")
+    p = commands.add_parser("load", help="drive a running server")
+    p.add_argument("--url", default="http://127.0.0.1:8791")
+    p.add_argument("--logins", default="50,200", help="comma-separated concurrent login clients")
+    p.add_argument("--staff", type=int, default=200, help="accounts to cycle through (as seeded)")
+    p.add_argument("--duration", type=float, default=15, help="seconds per level")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed(args.staff)
+    elif args.command == "serve":
+        serve(args.port, args.no_pool)
+    else:
+        load(args.url, [int(c) for c in args.logins.split(",")], args.staff, args.duration)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Row parsing and reporting for bulk upload endpoints.
+
+Uploads are either a JSON array of objects or CSV with a header row; the
+Content-Type header decides which. Rows are yielded one at a time with their
+1-based row number so handlers can validate each row, collect per-row errors,
+and write the valid ones in batches instead of one request per record.
+"""
+import csv
+import io
+import json
+from typing import Iterator, Tuple
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+MAX_ROWS = 50000
+LOOKUP_CHUNK = 500  # values per IN (...) when resolving uploaded keys
+
+def _csv_rows(text: str) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(io.StringIO(text))
+    for n, record in enumerate(reader, start=1):
+        if n > MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_ROWS} rows per upload")
+        # Blank cells mean "not provided", so they fall back to schema defaults
+        yield n, {
+            key.strip(): value.strip()
+            for key, value in record.items()
+            if key and isinstance(value, str) and value.strip() != ""
+        }
+
+def _json_rows(data: list) -> Iterator[Tuple[int, dict]]:
+    for n, record in enumerate(data, start=1):
+        yield n, record if isinstance(record, dict) else {"_": record}
+
+async def read_rows(request: Request) -> Iterator[Tuple[int, dict]]:
+    """Read the request body and return an iterator of (row_number, fields)"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+
+    if content_type in ("text/csv", "application/csv"):
+        return _csv_rows(text)
+    if content_type in ("application/json", ""):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="JSON body must be an array of objects")
+        if len(data) > MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_ROWS} rows per upload")
+        return _json_rows(data)
+    raise HTTPException(status_code=415, detail="Send application/json (array of objects) or text/csv")
+
+def parse_row(model: type, fields: dict):
+    """Validate one row against a schema. Returns (instance, None) or (None, error message)."""
+    try:
+        return model(**fields), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+            for err in e.errors()
+        )
+
+def chunked(values: list, size: int = LOOKUP_CHUNK) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
@@ -0,0 +1,94 @@
+"""
+In-process caches.
+
+TTLCache is a small thread-safe TTL + LRU map. Entries live in one worker
+process only, so anything cached here must tolerate being up to `ttl`
+seconds stale on other workers; writers call the invalidate helpers to drop
+their own process's copy immediately.
+"""
+import os
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+class TTLCache:
+    """Thread-safe TTL + LRU cache"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value; `ttl` overrides the cache-wide TTL for this entry"""
+        ttl = self.ttl if ttl is None else ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, ttl)
+        return value
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                                   ttl: Optional[float] = None) -> Any:
+        """get_or_compute for async handlers; `compute` is a coroutine function"""
+        value = self.get(key)
+        if value is None:
+            value = await compute()
+            self.put(key, value, ttl)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]):
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Dashboard analytics results, keyed by (organization_id, name, *params)
+analytics_cache = TTLCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+)
+
+def invalidate_analytics(organization_id: Optional[int]):
+    """Drop every cached analytics result for an organization. Call after writes that change them."""
+    analytics_cache.invalidate_matching(lambda key: key[0] == organization_id)
+
+# Attendance scanner lookups: (organization_id, barcode) -> user_id
+barcode_cache = TTLCache(
+    maxsize=int(os.getenv("BARCODE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("BARCODE_CACHE_TTL", "600"))
+)
+
+def invalidate_barcodes(organization_id: Optional[int]):
+    """Drop an organization's cached barcode lookups. Call after staff are removed or re-carded."""
+    barcode_cache.invalidate_matching(lambda key: key[0] == organization_id)
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from fastapi.concurrency import run_in_threadpool
+from collections import deque
+from time import monotonic, perf_counter
 import os
+import threading
 
 # Use PostgreSQL in production (from environment), SQLite in development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./attendance.db")
@@ -10,12 +16,148 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./attendance.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Connection pool settings (per worker process). DB_MAX_CONNECTIONS, when set, is the
+# server-side budget shared by all WEB_CONCURRENCY workers and sizes the pool to fit it;
+# explicit DB_POOL_SIZE / DB_MAX_OVERFLOW take precedence. DB_PGBOUNCER=true switches to
+# NullPool so PgBouncer does the pooling and idle connections are never held here.
+# DB_ASYNC=true adds a second (async) engine for the async read endpoints; the budget
+# is then split evenly between the two pools.
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+DB_ASYNC = _env_flag("DB_ASYNC", "false")
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+_engine_count = 2 if DB_ASYNC else 1
+_worker_budget = max(1, DB_MAX_CONNECTIONS // (WEB_CONCURRENCY * _engine_count)) if DB_MAX_CONNECTIONS else 0
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_worker_budget or 5)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(max(0, _worker_budget - DB_POOL_SIZE) if _worker_budget else 10)))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # below typical managed-Postgres idle cutoffs
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+DB_PGBOUNCER = _env_flag("DB_PGBOUNCER", "false")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+class _PoolMetrics:
+    """Checkout wait times for the connection pool (how long requests queued for a connection)"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_timeout = None
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                self.last_timeout = monotonic()
+            else:
+                self.checkouts += 1
+                self.total_wait += seconds
+                self.max_wait = max(self.max_wait, seconds)
+            self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, timeouts, total_wait, max_wait = self.checkouts, self.timeouts, self.total_wait, self.max_wait
+            last_timeout = self.last_timeout
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else 0.0
+        return {
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "seconds_since_timeout": round(monotonic() - last_timeout, 1) if last_timeout is not None else None,
+            "avg_wait_ms": round(total_wait / checkouts * 1000, 2) if checkouts else 0.0,
+            "max_wait_ms": round(max_wait * 1000, 2),
+            "recent_p50_wait_ms": pct(0.5),
+            "recent_p95_wait_ms": pct(0.95),
+        }
+
+pool_metrics = _PoolMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record(perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record(perf_counter() - start)
+        return conn
+
+_pool_kwargs = dict(
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING
+)
+
 # Configure engine based on database type
 if "sqlite" in DATABASE_URL:
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **_pool_kwargs)
+elif DB_PGBOUNCER:
+    # PostgreSQL behind PgBouncer: connect per checkout and let PgBouncer keep server connections
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}
+    )
 else:
     # PostgreSQL configuration
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **_pool_kwargs)
+
+def pool_stats() -> dict:
+    """Pool configuration, current occupancy and checkout wait metrics"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "pre_ping": pool._pre_ping, "recycle": pool._recycle}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(0, pool._max_overflow)
+        checked_out = pool.checkedout()
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_out=checked_out,
+            idle=pool.checkedin(),
+            saturation=round(checked_out / capacity, 3)
+        )
+    stats["wait"] = pool_metrics.snapshot()
+    if async_engine is not None:
+        async_pool = async_engine.pool
+        stats["async_pool"] = {"pool": type(async_pool).__name__}
+        if isinstance(async_pool, QueuePool):
+            stats["async_pool"].update(
+                size=async_pool.size(),
+                checked_out=async_pool.checkedout(),
+                idle=async_pool.checkedin()
+            )
+    return stats
+
+_probe_engine = None
+
+def ping() -> float:
+    """SELECT 1 round trip in milliseconds, on a fresh connection outside the pool so a
+    saturated pool cannot make the probe wait DB_POOL_TIMEOUT for a checkout"""
+    global _probe_engine
+    if _probe_engine is None:
+        connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {"connect_timeout": DB_CONNECT_TIMEOUT}
+        _probe_engine = create_engine(DATABASE_URL, poolclass=NullPool, connect_args=connect_args)
+    start = perf_counter()
+    with _probe_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return round((perf_counter() - start) * 1000, 2)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -27,3 +169,92 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def _async_url(url: str):
+    """The sync DATABASE_URL with an asyncio driver (asyncpg / aiosqlite) swapped in"""
+    url = make_url(os.getenv("ASYNC_DATABASE_URL", url))
+    if url.drivername.startswith("sqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    query = dict(url.query)
+    # asyncpg takes ssl=..., not libpq's sslmode=...
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    if DB_PGBOUNCER:
+        # Transaction-mode PgBouncer cannot keep server-side prepared statements
+        query["prepared_statement_cache_size"] = "0"
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+# Optional async engine (DB_ASYNC=true, needs asyncpg or aiosqlite installed). Async
+# handlers then wait on the database without holding a threadpool thread.
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_pool_kwargs = {k: v for k, v in _pool_kwargs.items() if k != "poolclass"}
+    if "sqlite" in DATABASE_URL:
+        async_engine = create_async_engine(_async_url(DATABASE_URL), **_async_pool_kwargs)
+    elif DB_PGBOUNCER:
+        async_engine = create_async_engine(
+            _async_url(DATABASE_URL),
+            poolclass=NullPool,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args={"timeout": DB_CONNECT_TIMEOUT, "statement_cache_size": 0}
+        )
+    else:
+        async_engine = create_async_engine(
+            _async_url(DATABASE_URL), connect_args={"timeout": DB_CONNECT_TIMEOUT}, **_async_pool_kwargs
+        )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+class ThreadedSession:
+    """Read-only awaitable execute/scalar/scalars over a sync Session, used by get_async_db
+    when DB_ASYNC is off. Each statement runs in the threadpool with its rows buffered there,
+    so async handlers behave the same on either stack."""
+
+    _buffered = {"prebuffer_rows": True}
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    def _run(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        finally:
+            # Return the connection before leaving the thread. Holding it across awaits lets
+            # requests queued on pool checkout fill the threadpool, and the holders can then
+            # never get a thread back to release theirs (deadlock until DB_POOL_TIMEOUT).
+            self.sync_session.close()
+
+    async def execute(self, statement, params=None):
+        return await run_in_threadpool(
+            self._run, self.sync_session.execute, statement, params, execution_options=self._buffered
+        )
+
+    async def scalar(self, statement, params=None):
+        return await run_in_threadpool(self._run, self.sync_session.scalar, statement, params)
+
+    async def scalars(self, statement, params=None):
+        result = await self.execute(statement, params)
+        return result.scalars()
+
+async def get_async_db():
+    """Session for `async def` handlers: an AsyncSession with DB_ASYNC=true, otherwise a
+    ThreadedSession over the sync pool. Use select() and `await db.execute(...)`."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    yield ThreadedSession(SessionLocal())
+
+def dialect_insert(db):
+    """INSERT construct for the session's dialect, with on_conflict_do_* support (PostgreSQL and SQLite)"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
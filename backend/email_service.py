@@ -2,41 +2,189 @@
 Email service for ShopERP
 Uses Gmail SMTP to send verification and password reset emails.
 
+Messages are queued in-process and delivered by background worker threads that
+keep their SMTP connection open between messages, reconnect when the server
+drops it, and retry failed sends with exponential backoff. Request handlers
+only enqueue, so they never wait on the SMTP handshake.
+
 Required environment variables:
   SMTP_EMAIL    - your Gmail address e.g. yourshop@gmail.com
   SMTP_PASSWORD - Gmail App Password (not your regular password)
                   Get it from: myaccount.google.com → Security → App passwords
   FRONTEND_URL  - your Vercel URL e.g. https://shop-magment-apk.vercel.app
+
+Optional (defaults suit Gmail; point them at a local server such as aiosmtpd for testing):
+  SMTP_HOST / SMTP_PORT / SMTP_USE_SSL  - smtp.gmail.com / 465 / true
+  EMAIL_WORKERS       - delivery threads (default 1)
+  EMAIL_MAX_RETRIES   - attempts per message after the first (default 3)
+  EMAIL_BATCH_SIZE    - messages sent per connection check (default 20)
+  EMAIL_IDLE_TIMEOUT  - seconds before an idle connection is closed (default 60)
 """
 import smtplib
 import os
+import queue
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 SMTP_EMAIL    = os.getenv("SMTP_EMAIL", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 FRONTEND_URL  = os.getenv("FRONTEND_URL", "https://shop-magment-apk.vercel.app")
+SMTP_HOST     = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT     = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL  = os.getenv("SMTP_USE_SSL", "true").lower() in ("1", "true", "yes")
+
+EMAIL_WORKERS      = int(os.getenv("EMAIL_WORKERS", "1"))
+EMAIL_MAX_RETRIES  = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_BATCH_SIZE   = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", "60"))
+RETRY_BASE_DELAY   = 1.0
+
+def _configured() -> bool:
+    # A password is only required for Gmail; a local relay/test server may not need login
+    return bool(SMTP_EMAIL) and (bool(SMTP_PASSWORD) or SMTP_HOST != "smtp.gmail.com")
+
+def _build_message(to_email: str, subject: str, html_body: str) -> str:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"]    = f"ShopERP <{SMTP_EMAIL}>"
+    msg["To"]      = to_email
+    msg.attach(MIMEText(html_body, "html"))
+    return msg.as_string()
+
+def _connect() -> smtplib.SMTP:
+    if SMTP_USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+    else:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_PASSWORD:
+        server.login(SMTP_EMAIL, SMTP_PASSWORD)
+    return server
+
+class EmailDispatcher:
+    """In-process outbound email queue served by worker threads with persistent SMTP connections"""
+
+    def __init__(self, workers: int = EMAIL_WORKERS, max_retries: int = EMAIL_MAX_RETRIES,
+                 batch_size: int = EMAIL_BATCH_SIZE, idle_timeout: float = EMAIL_IDLE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.batch_size = max(1, batch_size)
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "connections": 0}
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"email-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
 
-def _send(to_email: str, subject: str, html_body: str) -> bool:
-    """Internal: send a single email. Returns True on success."""
-    if not SMTP_EMAIL or not SMTP_PASSWORD:
-        print("⚠️ Email not configured (SMTP_EMAIL / SMTP_PASSWORD missing). Skipping email.")
-        return False
-    try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"]    = f"ShopERP <{SMTP_EMAIL}>"
-        msg["To"]      = to_email
-        msg.attach(MIMEText(html_body, "html"))
-
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.sendmail(SMTP_EMAIL, to_email, msg.as_string())
-        print(f"✅ Email sent to {to_email}: {subject}")
+    def stop(self, timeout: float = 10.0):
+        """Deliver what is already queued (within timeout), then stop the workers"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        self._stopping.set()
+        for _ in threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+    def enqueue(self, to_email: str, subject: str, html_body: str) -> bool:
+        """Queue a message for background delivery. Returns False if email is not configured."""
+        if not _configured():
+            print("⚠️ Email not configured (SMTP_EMAIL / SMTP_PASSWORD missing). Skipping email.")
+            return False
+        self.start()
+        self._queue.put((to_email, subject, _build_message(to_email, subject, html_body)))
         return True
-    except Exception as e:
-        print(f"❌ Email send failed to {to_email}: {e}")
-        return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self, timeout: float):
+        """Block for one message, then take whatever else is already waiting up to batch_size"""
+        try:
+            first = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        batch = [first]
+        while first is not None and len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                break
+        return batch
+
+    def _run(self):
+        server = None
+        try:
+            while True:
+                batch = self._next_batch(self.idle_timeout)
+                if not batch:
+                    # Idle: don't hold a connection the server will drop anyway
+                    server = self._close(server)
+                    continue
+                for item in batch:
+                    if item is None:
+                        return
+                    server = self._deliver(server, item)
+        finally:
+            self._close(server)
+
+    def _deliver(self, server, item):
+        to_email, subject, raw = item
+        attempt = 0
+        while True:
+            reused = server is not None
+            try:
+                if server is None:
+                    server = _connect()
+                    self._count("connections")
+                server.sendmail(SMTP_EMAIL, to_email, raw)
+                self._count("sent")
+                print(f"✅ Email sent to {to_email}: {subject}")
+                return server
+            except Exception as e:
+                server = self._close(server)
+                if reused and isinstance(e, smtplib.SMTPServerDisconnected):
+                    # The kept-alive connection went stale; reconnect straight away
+                    continue
+                if attempt >= self.max_retries or self._stopping.is_set():
+                    self._count("failed")
+                    print(f"❌ Email send failed to {to_email}: {e}")
+                    return server
+                self._count("retried")
+                time.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+                attempt += 1
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _close(server):
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        return None
+
+dispatcher = EmailDispatcher()
 
 # ─── Email Templates ───────────────────────────────────────────────────────
 
@@ -53,7 +201,7 @@ def send_verification_email(to_email: str, username: str, token: str) -> bool:
       <p style="color:rgba(255,255,255,0.35);font-size:0.8rem">This link expires in 24 hours. If you didn't register, ignore this email.</p>
     </div>
     """
-    return _send(to_email, "Verify your ShopERP email", html)
+    return dispatcher.enqueue(to_email, "Verify your ShopERP email", html)
 
 
 def send_password_reset_email(to_email: str, username: str, token: str) -> bool:
@@ -69,4 +217,4 @@ def send_password_reset_email(to_email: str, username: str, token: str) -> bool:
       <p style="color:rgba(255,255,255,0.35);font-size:0.8rem">This link expires in 1 hour. If you didn't request this, ignore this email — your password won't change.</p>
     </div>
     """
-    return _send(to_email, "Reset your ShopERP password", html)
+    return dispatcher.enqueue(to_email, "Reset your ShopERP password", html)
@@ -0,0 +1,92 @@
+"""
+In-process publish/subscribe bus for live dashboard updates.
+
+Request handlers call `bus.publish(...)` after committing a write; every open
+/events/stream connection for that organization receives the event. Handlers
+run on worker threads while subscribers wait on the event loop, so delivery
+goes through loop.call_soon_threadsafe.
+
+Events are only seen by connections on the same worker process. Each
+subscriber has a bounded queue: a client that stops reading loses its oldest
+events rather than growing memory, and should re-fetch when it reconnects.
+"""
+import asyncio
+import itertools
+import threading
+from datetime import datetime
+from typing import Optional
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class Subscription:
+    def __init__(self, organization_id: int, user_id: int, see_all: bool, loop: asyncio.AbstractEventLoop):
+        self.organization_id = organization_id
+        self.user_id = user_id
+        self.see_all = see_all
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def wants(self, event: dict) -> bool:
+        return self.see_all or event["user_id"] == self.user_id
+
+    def _offer(self, event: dict):
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, organization_id: int, user_id: int, see_all: bool) -> Subscription:
+        """Register a subscriber; must be called from the event loop that will read it"""
+        sub = Subscription(organization_id, user_id, see_all, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(organization_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.organization_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.organization_id]
+
+    def publish(self, organization_id: Optional[int], event_type: str, data: dict, user_id: Optional[int] = None):
+        """Send an event to the organization's owners, and to `user_id` if it concerns one staff member.
+
+        Safe to call from any thread; never blocks.
+        """
+        if organization_id is None:
+            return
+        event = {
+            "id": next(self._ids),
+            "type": event_type,
+            "user_id": user_id,
+            "data": data,
+            "at": datetime.utcnow().isoformat()
+        }
+        with self._lock:
+            subs = list(self._subscribers.get(organization_id, ()))
+        for sub in subs:
+            if not sub.wants(event):
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:
+                # Event loop already closed (server shutting down)
+                self.unsubscribe(sub)
+
+    def subscriber_count(self, organization_id: Optional[int] = None) -> int:
+        with self._lock:
+            if organization_id is not None:
+                return len(self._subscribers.get(organization_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+bus = EventBus()
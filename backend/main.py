@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import sys
 import os
@@ -6,11 +7,14 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend import database
-from backend.routers import auth, staff, attendance, messages, hr, pos, analytics
+from backend.routers import auth, staff, attendance, messages, hr, pos, analytics, events, export
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 IS_PRODUCTION = bool(DATABASE_URL) and "localhost" not in DATABASE_URL
 
+class MigrationError(RuntimeError):
+    """A migration step the application cannot run without failed; startup must stop"""
+
 def safe_migrate():
     """Add missing columns and tables without crashing"""
     from sqlalchemy import text, inspect
@@ -67,6 +71,20 @@ def safe_migrate():
                     except Exception as e:
                         print(f"⚠️ attendance.organization_id: {e}")
                         conn.rollback()
+                if 'day' not in att_cols:
+                    try:
+                        conn.execute(text("ALTER TABLE attendance ADD COLUMN day DATE"))
+                        # Backfill the earliest row per staff member per day; older duplicates
+                        # keep day NULL so the unique (user_id, day) index can be built
+                        conn.execute(text(
+                            "UPDATE attendance SET day = DATE(date) WHERE id IN "
+                            "(SELECT MIN(id) FROM attendance GROUP BY user_id, DATE(date))"
+                        ))
+                        conn.commit()
+                        print("✅ Added day column to attendance")
+                    except Exception as e:
+                        print(f"⚠️ attendance.day: {e}")
+                        conn.rollback()
 
             # Migration 3: add organization_id to messages table if missing
             if 'messages' in existing_tables:
@@ -79,9 +97,32 @@ def safe_migrate():
                     except Exception as e:
                         print(f"⚠️ messages.organization_id: {e}")
                         conn.rollback()
+                if 'read_at' not in msg_cols:
+                    try:
+                        conn.execute(text("ALTER TABLE messages ADD COLUMN read_at TIMESTAMP"))
+                        # Read state was never tracked before; treat existing messages as read
+                        # rather than flooding every inbox with its whole history as unread
+                        conn.execute(text("UPDATE messages SET read_at = \"timestamp\" WHERE read_at IS NULL"))
+                        conn.commit()
+                        print("✅ Added read_at column to messages")
+                    except Exception as e:
+                        print(f"⚠️ messages.read_at: {e}")
+                        conn.rollback()
+
+            # Migration 3b: idempotency key for synced offline sales
+            if 'sales' in existing_tables:
+                sale_cols = [c['name'] for c in inspector.get_columns('sales')]
+                if 'idempotency_key' not in sale_cols:
+                    try:
+                        conn.execute(text("ALTER TABLE sales ADD COLUMN idempotency_key VARCHAR"))
+                        conn.commit()
+                        print("✅ Added idempotency_key column to sales")
+                    except Exception as e:
+                        print(f"⚠️ sales.idempotency_key: {e}")
+                        conn.rollback()
 
             # Create new ERP tables if missing
-            new_tables = ['salaries','leaves','payslips','products','sales','sale_items']
+            new_tables = ['salaries','leaves','payslips','products','sales','sale_items','daily_sales_rollup']
             missing = [t for t in new_tables if t not in existing_tables]
             if missing:
                 # Import models here to avoid circular imports at module level
@@ -91,6 +132,79 @@ def safe_migrate():
             else:
                 print("✅ All tables exist")
 
+            # Product search: trigram extension on PostgreSQL. Blank SKUs become NULL and
+            # repeated SKUs within a shop get a suffix (the oldest product keeps the SKU)
+            # so the unique (organization_id, sku) index below can be built
+            if 'products' in existing_tables:
+                if conn.dialect.name == "postgresql":
+                    try:
+                        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                        conn.commit()
+                    except Exception as e:
+                        print(f"⚠️ pg_trgm extension: {e}")
+                        conn.rollback()
+                try:
+                    conn.execute(text("UPDATE products SET sku = NULL WHERE TRIM(sku) = ''"))
+                    conn.commit()
+                except Exception as e:
+                    print(f"⚠️ products.sku cleanup: {e}")
+                    conn.rollback()
+                try:
+                    result = conn.execute(text(
+                        "UPDATE products SET sku = sku || '-dup' || CAST(id AS VARCHAR) "
+                        "WHERE sku IS NOT NULL AND id NOT IN "
+                        "(SELECT MIN(id) FROM products WHERE sku IS NOT NULL GROUP BY organization_id, sku)"
+                    ))
+                    conn.commit()
+                    if result.rowcount:
+                        print(f"✅ Renamed {result.rowcount} duplicate product SKUs")
+                except Exception as e:
+                    print(f"⚠️ products.sku dedupe: {e}")
+                    conn.rollback()
+
+            # Migration 4: composite indexes for tenant + date filters (no-op when present)
+            from backend import models
+            for table in models.Base.metadata.tables.values():
+                if table.name not in existing_tables:
+                    continue
+                existing_indexes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing_indexes:
+                        continue
+                    # Dialect-specific indexes (e.g. trigram) are skipped elsewhere
+                    ddl_if = getattr(index, "_ddl_if", None)
+                    if ddl_if is not None and ddl_if.dialect not in (None, conn.dialect.name):
+                        continue
+                    try:
+                        index.create(bind=conn)
+                        conn.commit()
+                        print(f"✅ Created index {index.name}")
+                    except Exception as e:
+                        conn.rollback()
+                        # ON CONFLICT upserts target the unique indexes; without one every
+                        # such write fails, so refuse to start rather than limp along
+                        if index.unique:
+                            raise MigrationError(
+                                f"could not create unique index {index.name} on {table.name} "
+                                f"(duplicate rows?): {e}"
+                            ) from e
+                        print(f"⚠️ index {index.name}: {e}")
+
+            # Backfill the sales rollup the first time its table appears
+            if 'daily_sales_rollup' in missing:
+                from backend import rollups
+                db = database.SessionLocal()
+                try:
+                    written = rollups.rebuild_daily_sales(db)
+                    print(f"✅ Backfilled daily_sales_rollup ({written} rows)")
+                except Exception as e:
+                    print(f"⚠️ daily_sales_rollup backfill: {e}")
+                    db.rollback()
+                finally:
+                    db.close()
+
+    except MigrationError:
+        raise
     except Exception as e:
         print(f"⚠️ Migration warning (non-fatal): {e}")
 
@@ -134,6 +248,13 @@ app.include_router(messages.router)
 app.include_router(hr.router)
 app.include_router(pos.router)
 app.include_router(analytics.router)
+app.include_router(events.router)
+app.include_router(export.router)
+
+@app.on_event("shutdown")
+def flush_email_queue():
+    from backend import email_service
+    email_service.dispatcher.stop()
 
 @app.get("/")
 def read_root():
@@ -146,6 +267,27 @@ def read_root():
 def health():
     return {"status": "ok"}
 
+@app.get("/health/db")
+def health_db():
+    """Database round-trip time plus connection pool saturation and checkout wait times"""
+    stats = database.pool_stats()
+    if stats.get("saturation", 0) >= 1:
+        # Every pooled connection is busy; the database itself may be fine
+        return JSONResponse(status_code=503, content={"status": "saturated", **stats})
+    try:
+        stats["ping_ms"] = database.ping()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "down", "error": str(e), **stats})
+    # Near-full pool or recent checkout timeouts: requests are queueing for connections
+    since_timeout = stats["wait"]["seconds_since_timeout"]
+    degraded = stats.get("saturation", 0) >= 0.9 or (since_timeout is not None and since_timeout < 300)
+    return {"status": "degraded" if degraded else "ok", **stats}
+
+@app.get("/health/password-pool")
+def health_password_pool():
+    from backend import auth as auth_core
+    return auth_core.password_pool_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
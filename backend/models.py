@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Float
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Enum, Float, Index, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -49,10 +49,17 @@ class User(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ix_attendance_org_date", "organization_id", "date"),
+        Index("ix_attendance_user_date", "user_id", "date"),
+        # One attendance row per staff member per (UTC) day; repeat scans update it
+        Index("uq_attendance_user_day", "user_id", "day", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     date = Column(DateTime, default=datetime.utcnow)
+    day = Column(Date, nullable=True)  # date.date(); NULL only on legacy duplicate rows
     check_in_time = Column(DateTime, nullable=True)
     check_out_time = Column(DateTime, nullable=True)
     status = Column(String) # Present, Absent, Late
@@ -65,6 +72,10 @@ class Attendance(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_receiver_read", "receiver_id", "read_at"),
+        Index("ix_messages_receiver_timestamp", "receiver_id", "timestamp"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
@@ -72,6 +83,7 @@ class Message(Base):
     message = Column(String)
     type = Column(String, default="normal") # normal, warning
     timestamp = Column(DateTime, default=datetime.utcnow)
+    read_at = Column(DateTime, nullable=True)  # None until the receiver reads it
 
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
@@ -109,6 +121,11 @@ class Leave(Base):
 
 class Payslip(Base):
     __tablename__ = "payslips"
+    __table_args__ = (
+        Index("ix_payslips_org_period", "organization_id", "year", "month"),
+        # One payslip per staff member per month; lets batch payroll re-runs skip existing rows
+        Index("uq_payslips_user_period", "user_id", "year", "month", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     organization_id = Column(Integer, ForeignKey("organizations.id"))
@@ -128,6 +145,15 @@ class Payslip(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # SKUs (and the barcodes printed from them) are unique within a shop; NULLs may repeat
+        Index("uq_products_org_sku", "organization_id", "sku", unique=True),
+        # Trigram indexes serve ILIKE '%term%' product search on PostgreSQL (needs pg_trgm)
+        Index("ix_products_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_products_sku_trgm", "sku", postgresql_using="gin",
+              postgresql_ops={"sku": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     name = Column(String, nullable=False)
@@ -142,10 +168,19 @@ class Product(Base):
 
     sale_items = relationship("SaleItem", back_populates="product")
 
+event.listen(Product.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_org_created", "organization_id", "created_at"),
+        # Terminals tag offline sales with a key so a replayed sync cannot double-record them
+        Index("uq_sales_org_idempotency_key", "organization_id", "idempotency_key", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"))
+    idempotency_key = Column(String, nullable=True)
     sold_by = Column(Integer, ForeignKey("users.id"))
     customer_name = Column(String, nullable=True, default="Walk-in")
     subtotal = Column(Float, default=0.0)
@@ -160,11 +195,24 @@ class Sale(Base):
 class SaleItem(Base):
     __tablename__ = "sale_items"
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    sale_id = Column(Integer, ForeignKey("sales.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
 
     sale = relationship("Sale", back_populates="items")
     product = relationship("Product", back_populates="sale_items")
+
+class DailySalesRollup(Base):
+    """Per-day sales totals, kept in step with `sales` by pos.create_sale so analytics never rescans raw sales"""
+    __tablename__ = "daily_sales_rollup"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "day", "payment_method", name="uq_daily_sales_rollup_org_day_method"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    payment_method = Column(String, nullable=False, default="cash")
+    sale_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Rows are ordered newest-first by a tuple of key columns, normally
+(timestamp, id). The cursor is an opaque token holding the key values of the
+last row on a page; the next page is fetched with a WHERE clause on those
+values rather than OFFSET, so every page costs the same as the first.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(raw, list) or len(raw) != len(keys):
+            raise ValueError("wrong key count")
+        values = []
+        for key, value in zip(keys, raw):
+            if key.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _after(keys: list, values: list):
+    """Rows strictly after `values` in descending (k0, k1, ...) order"""
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_prefix = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, key < values[i]))
+    return or_(*clauses)
+
+def _page_query(query, keys: List, cursor: Optional[str], limit: int):
+    """Apply the cursor, key order and limit (+1 to detect a next page) to a Query or select()"""
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys)))
+    return query.order_by(*[k.desc() for k in keys]).limit(limit + 1)
+
+def _page(rows: list, keys: List, limit: int) -> dict:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, k.key) for k in keys])
+    return {"items": rows, "next_cursor": next_cursor}
+
+def paginate(query, keys: List, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> dict:
+    """Return {"items", "next_cursor"} for one page of `query`, ordered by `keys` descending"""
+    limit = min(max(limit, 1), MAX_LIMIT)
+    return _page(_page_query(query, keys, cursor, limit).all(), keys, limit)
+
+async def paginate_async(db, stmt, keys: List, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> dict:
+    """paginate() for a single-entity select() on a database.get_async_db session"""
+    limit = min(max(limit, 1), MAX_LIMIT)
+    result = await db.execute(_page_query(stmt, keys, cursor, limit))
+    return _page(result.scalars().all(), keys, limit)
@@ -0,0 +1,28 @@
+"""
+Half-open datetime bounds for calendar periods.
+
+Filtering with `column >= start AND column < end` keeps date predicates
+sargable, so (organization_id, date)-style indexes can be used instead of
+wrapping the column in extract()/date().
+"""
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional
+
+def day_bounds(d: date):
+    """[start, end) datetimes covering a single calendar day"""
+    start = datetime.combine(d, time.min)
+    return start, start + timedelta(days=1)
+
+def month_bounds(year: int, month: int):
+    """[start, end) datetimes covering a calendar month"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def client_time(value: Optional[datetime], now: datetime) -> datetime:
+    """Device-reported timestamp as naive UTC (how times are stored), never later than the server clock"""
+    if value is None:
+        return now
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now)
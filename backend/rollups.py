@@ -0,0 +1,97 @@
+"""
+Daily sales rollup maintenance for ShopERP.
+
+`daily_sales_rollup` holds one row per (organization, day, payment method) with
+the sale count and revenue for that day. pos.create_sale and the batch sale sync
+bump the matching rows inside the sales' own transaction; analytics reads the
+rollup instead of rescanning `sales`.
+
+Rebuild from raw sales (run from the repo root; all organizations, or a single one):
+  python -m backend.rollups
+  python -m backend.rollups <organization_id>
+"""
+import sys
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+def record_sale(db: Session, sale: models.Sale):
+    """Add a flushed sale to its day's rollup row. Runs in the caller's transaction; does not commit."""
+    record_sales(db, [{
+        "organization_id": sale.organization_id,
+        "created_at": sale.created_at,
+        "payment_method": sale.payment_method,
+        "total": sale.total
+    }])
+
+def record_sales(db: Session, sales: list):
+    """Add many sales to the rollup with one executemany upsert, one row per (organization, day, method).
+
+    `sales` are dicts with organization_id, created_at, payment_method and total.
+    """
+    totals = {}
+    for sale in sales:
+        key = (sale["organization_id"], sale["created_at"].date(), sale["payment_method"] or "cash")
+        count, revenue = totals.get(key, (0, 0.0))
+        totals[key] = (count + 1, revenue + sale["total"])
+    if not totals:
+        return
+
+    table = models.DailySalesRollup.__table__
+    stmt = dialect_insert(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.organization_id, table.c.day, table.c.payment_method],
+        set_={
+            "sale_count": table.c.sale_count + stmt.excluded.sale_count,
+            "revenue": table.c.revenue + stmt.excluded.revenue
+        }
+    )
+    db.execute(stmt, [
+        {"organization_id": org_id, "day": day, "payment_method": method, "sale_count": count, "revenue": revenue}
+        for (org_id, day, method), (count, revenue) in totals.items()
+    ])
+
+def rebuild_daily_sales(db: Session, organization_id: Optional[int] = None) -> int:
+    """Recompute rollup rows from `sales` with one grouped INSERT ... SELECT. Returns rows written."""
+    rollup = models.DailySalesRollup
+    delete_q = db.query(rollup)
+    if organization_id is not None:
+        delete_q = delete_q.filter(rollup.organization_id == organization_id)
+    delete_q.delete(synchronize_session=False)
+
+    day_col = func.date(models.Sale.created_at)
+    method_col = func.coalesce(models.Sale.payment_method, "cash")
+    source = db.query(
+        models.Sale.organization_id,
+        day_col,
+        method_col,
+        func.count(models.Sale.id),
+        func.coalesce(func.sum(models.Sale.total), 0)
+    ).filter(models.Sale.organization_id.isnot(None))
+    if organization_id is not None:
+        source = source.filter(models.Sale.organization_id == organization_id)
+    source = source.group_by(models.Sale.organization_id, day_col, method_col)
+
+    table = rollup.__table__
+    result = db.execute(table.insert().from_select(
+        ["organization_id", "day", "payment_method", "sale_count", "revenue"],
+        source.statement
+    ))
+    db.commit()
+    return result.rowcount
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+
+    org_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db = SessionLocal()
+    try:
+        written = rebuild_daily_sales(db, org_id)
+        scope = f"organization {org_id}" if org_id is not None else "all organizations"
+        print(f"✅ Rebuilt daily_sales_rollup for {scope}: {written} rows")
+    finally:
+        db.close()
@@ -1,24 +1,109 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from datetime import datetime, date
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, case, and_, cast, extract, literal_column, select, Time
+from datetime import datetime, date, timedelta
+from typing import List, Optional
+import os
 from .. import database, models, auth
+from ..periods import day_bounds, month_bounds
+from ..cache import analytics_cache
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+MAX_RANGE_DAYS = 366 * 5
+GRANULARITIES = ("day", "week", "month")
+OVERVIEW_CACHE_TTL = float(os.getenv("OVERVIEW_CACHE_TTL", "10"))
+
+def _resolve_range(days: int, start: Optional[date], end: Optional[date]):
+    """Turn `days` or an explicit start/end pair into an inclusive (start, end) date range"""
+    end = end or date.today()
+    if start is None:
+        if days < 1:
+            raise HTTPException(status_code=400, detail="days must be at least 1")
+        start = end - timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_RANGE_DAYS} days")
+    return start, end
+
+def _day_range(start: date, end: date):
+    for i in range((end - start).days + 1):
+        yield start + timedelta(days=i)
+
+def _bucket_start(d: date, granularity: str) -> date:
+    if granularity == "week":
+        return d - timedelta(days=d.weekday())
+    if granularity == "month":
+        return d.replace(day=1)
+    return d
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def _bucket_range(start: date, end: date, granularity: str):
+    """Every bucket start between start and end, so empty periods show up as zeros"""
+    b = _bucket_start(start, granularity)
+    while b <= end:
+        yield b
+        if granularity == "month":
+            b = _next_month(b)
+        elif granularity == "week":
+            b += timedelta(days=7)
+        else:
+            b += timedelta(days=1)
+
+def _bucket_expr(db: AsyncSession, column, granularity: str):
+    """SQL expression truncating a timestamp to the start of its day/week/month (weeks start Monday)"""
+    if db.bind.dialect.name == "postgresql":
+        if granularity == "day":
+            return func.date(column)
+        # Inline the (whitelisted) unit so SELECT and GROUP BY render identical SQL
+        return func.date(func.date_trunc(literal_column(f"'{granularity}'"), column))
+    if granularity == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    if granularity == "month":
+        return func.date(column, "start of month")
+    return func.date(column)
+
+def _seconds_of_day(db: AsyncSession, column):
+    """Seconds since midnight of a timestamp column"""
+    if db.bind.dialect.name == "postgresql":
+        return extract("epoch", cast(column, Time))
+    return (func.julianday(column) - func.julianday(func.date(column))) * 86400
+
+def _seconds_between(db: AsyncSession, start_col, end_col):
+    if db.bind.dialect.name == "postgresql":
+        return extract("epoch", end_col - start_col)
+    return (func.julianday(end_col) - func.julianday(start_col)) * 86400
+
+def _format_time_of_day(seconds) -> Optional[str]:
+    if seconds is None:
+        return None
+    minutes = int(round(seconds / 60))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _as_date(value) -> date:
+    """func.date() returns a string on SQLite and a date on PostgreSQL"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
 @router.get("/attendance")
-def get_attendance_stats(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+async def get_attendance_stats(
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Attendance summary for the current month"""
     now = datetime.utcnow()
-    records = db.query(models.Attendance).filter(
+    month_start, month_end = month_bounds(now.year, now.month)
+    records = (await db.execute(select(models.Attendance).where(
         models.Attendance.organization_id == current_user.organization_id,
-        extract('month', models.Attendance.date) == now.month,
-        extract('year', models.Attendance.date) == now.year
-    ).all()
+        models.Attendance.date >= month_start,
+        models.Attendance.date < month_end
+    ))).scalars().all()
 
     total = len(records)
     present = sum(1 for r in records if r.status == "Present")
@@ -38,71 +123,126 @@ def get_attendance_stats(
     }
 
 @router.get("/attendance/daily")
-def get_daily_attendance(
+async def get_daily_attendance(
     days: int = 30,
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Daily attendance count for last N days"""
-    from datetime import timedelta
+    """Daily attendance counts (Present/Late/Absent) for the last N days or a start/end range"""
+    start, end = _resolve_range(days, start, end)
+
+    # One grouped query for the whole window; empty days are filled in below
+    day_col = func.date(models.Attendance.date)
+    rows = (await db.execute(select(
+        day_col.label("day"),
+        models.Attendance.status,
+        func.count(models.Attendance.id).label("count")
+    ).where(
+        models.Attendance.organization_id == current_user.organization_id,
+        models.Attendance.date >= day_bounds(start)[0],
+        models.Attendance.date < day_bounds(end)[1]
+    ).group_by(day_col, models.Attendance.status))).all()
+
+    counts = {}
+    for row in rows:
+        counts[(_as_date(row.day), row.status)] = row.count
+
     result = []
-    today = date.today()
-    for i in range(days - 1, -1, -1):
-        d = today - timedelta(days=i)
-        count = db.query(models.Attendance).filter(
-            models.Attendance.organization_id == current_user.organization_id,
-            func.date(models.Attendance.date) == d,
-            models.Attendance.status == "Present"
-        ).count()
-        result.append({"date": d.strftime("%d %b"), "present": count})
+    for d in _day_range(start, end):
+        result.append({
+            "date": d.strftime("%d %b"),
+            "day": d.isoformat(),
+            "present": counts.get((d, "Present"), 0),
+            "late": counts.get((d, "Late"), 0),
+            "absent": counts.get((d, "Absent"), 0),
+        })
     return result
 
 @router.get("/staff-performance")
-def get_staff_performance(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+async def get_staff_performance(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: Optional[int] = None,
+    order: str = "top",
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Per-staff attendance score for this month"""
-    now = datetime.utcnow()
-    staff_list = db.query(models.User).filter(
+    """Per-staff attendance score, check-in time and hours worked (default: this month so far).
+
+    `limit` with `order=top|bottom` returns only the best or worst K staff.
+    """
+    if order not in ("top", "bottom"):
+        raise HTTPException(status_code=400, detail="order must be 'top' or 'bottom'")
+    # Default to the month that `end` falls in, so an end-only request is never an inverted range
+    start, end = _resolve_range(1, start or (end or date.today()).replace(day=1), end)
+
+    att = models.Attendance
+    # Outer join keeps staff with no records in the window (score 0)
+    total = func.count(att.id)
+    present = func.sum(case((att.status.in_(["Present", "Late"]), 1), else_=0))
+    score = case((total == 0, 0.0), else_=present * 100.0 / total)
+    worked = and_(att.check_in_time.isnot(None), att.check_out_time.isnot(None))
+
+    query = select(
+        models.User.id,
+        models.User.username,
+        total.label("total"),
+        present.label("present"),
+        func.sum(case((att.status == "Late", 1), else_=0)).label("late"),
+        func.sum(case((att.status == "Absent", 1), else_=0)).label("absent"),
+        func.avg(_seconds_of_day(db, att.check_in_time)).label("avg_check_in"),
+        func.avg(case((worked, _seconds_between(db, att.check_in_time, att.check_out_time)))).label("avg_worked"),
+        score.label("score")
+    ).outerjoin(att, and_(
+        att.user_id == models.User.id,
+        att.date >= day_bounds(start)[0],
+        att.date < day_bounds(end)[1]
+    )).where(
         models.User.organization_id == current_user.organization_id,
         models.User.role == "staff"
-    ).all()
+    ).group_by(models.User.id, models.User.username)
+
+    score_order = score.desc() if order == "top" else score.asc()
+    query = query.order_by(score_order, models.User.username)
+    if limit is not None:
+        query = query.limit(max(limit, 0))
 
     result = []
-    for staff in staff_list:
-        records = db.query(models.Attendance).filter(
-            models.Attendance.user_id == staff.id,
-            extract('month', models.Attendance.date) == now.month,
-            extract('year', models.Attendance.date) == now.year
-        ).all()
-        total = len(records)
-        present = sum(1 for r in records if r.status in ["Present", "Late"])
-        score = round((present / total * 100) if total else 0, 1)
+    for row in (await db.execute(query)).all():
         result.append({
-            "staff_id": staff.id,
-            "username": staff.username,
-            "total_days": total,
-            "present_days": present,
-            "score": score
+            "staff_id": row.id,
+            "username": row.username,
+            "total_days": row.total,
+            "present_days": row.present or 0,
+            "late_days": row.late or 0,
+            "absent_days": row.absent or 0,
+            "score": round(row.score or 0, 1),
+            "avg_check_in": _format_time_of_day(row.avg_check_in),
+            "avg_hours_worked": round(row.avg_worked / 3600, 2) if row.avg_worked is not None else None
         })
-    return sorted(result, key=lambda x: x["score"], reverse=True)
+    return result
 
 @router.get("/sales-summary")
-def get_sales_summary(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+async def get_sales_summary(
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Sales stats for current month"""
     now = datetime.utcnow()
-    sales = db.query(models.Sale).filter(
-        models.Sale.organization_id == current_user.organization_id,
-        extract('month', models.Sale.created_at) == now.month,
-        extract('year', models.Sale.created_at) == now.year
-    ).all()
-
-    total_revenue = sum(s.total for s in sales)
-    total_sales = len(sales)
+    month_start = date(now.year, now.month, 1)
+    totals = (await db.execute(select(
+        func.coalesce(func.sum(models.DailySalesRollup.sale_count), 0).label("count"),
+        func.coalesce(func.sum(models.DailySalesRollup.revenue), 0).label("revenue")
+    ).where(
+        models.DailySalesRollup.organization_id == current_user.organization_id,
+        models.DailySalesRollup.day >= month_start,
+        models.DailySalesRollup.day < _next_month(month_start)
+    ))).one()
+
+    total_revenue = totals.revenue
+    total_sales = totals.count
     avg_sale = round(total_revenue / total_sales, 2) if total_sales else 0
 
     return {
@@ -114,65 +254,150 @@ def get_sales_summary(
     }
 
 @router.get("/sales/daily")
-def get_daily_sales(
+async def get_daily_sales(
     days: int = 30,
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    breakdown: Optional[str] = None,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Daily revenue for last N days"""
-    from datetime import timedelta
+    """Revenue and sale count per day/week/month, optionally split by payment_method or sold_by"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity must be 'day', 'week' or 'month'")
+    if breakdown not in (None, "payment_method", "sold_by"):
+        raise HTTPException(status_code=400, detail="breakdown must be 'payment_method' or 'sold_by'")
+    start, end = _resolve_range(days, start, end)
+
+    if breakdown == "sold_by":
+        # The rollup is keyed by payment method only, so per-seller splits read raw sales
+        day_col, revenue_col, org_col = models.Sale.created_at, models.Sale.total, models.Sale.organization_id
+        lower, upper = day_bounds(start)[0], day_bounds(end)[1]
+        count_agg = func.count(models.Sale.id)
+        key_col = models.Sale.sold_by
+    else:
+        rollup = models.DailySalesRollup
+        day_col, revenue_col, org_col = rollup.day, rollup.revenue, rollup.organization_id
+        lower, upper = start, end + timedelta(days=1)
+        count_agg = func.coalesce(func.sum(rollup.sale_count), 0)
+        key_col = rollup.payment_method
+
+    bucket_col = _bucket_expr(db, day_col, granularity)
+    columns = [
+        bucket_col.label("bucket"),
+        func.coalesce(func.sum(revenue_col), 0).label("revenue"),
+        count_agg.label("count")
+    ]
+    group_by = [bucket_col]
+    if breakdown:
+        columns.append(key_col.label("key"))
+        group_by.append(key_col)
+
+    rows = (await db.execute(select(*columns).where(
+        org_col == current_user.organization_id,
+        day_col >= lower,
+        day_col < upper
+    ).group_by(*group_by))).all()
+
+    buckets = {}
+    for row in rows:
+        entry = buckets.setdefault(_as_date(row.bucket), {"revenue": 0.0, "count": 0, "breakdown": {}})
+        entry["revenue"] += row.revenue
+        entry["count"] += row.count
+        if breakdown:
+            entry["breakdown"][str(row.key)] = {"revenue": round(row.revenue, 2), "count": row.count}
+
     result = []
-    today = date.today()
-    for i in range(days - 1, -1, -1):
-        d = today - timedelta(days=i)
-        sales = db.query(models.Sale).filter(
-            models.Sale.organization_id == current_user.organization_id,
-            func.date(models.Sale.created_at) == d
-        ).all()
-        revenue = sum(s.total for s in sales)
-        result.append({"date": d.strftime("%d %b"), "revenue": round(revenue, 2), "count": len(sales)})
+    for b in _bucket_range(start, end, granularity):
+        entry = buckets.get(b, {"revenue": 0.0, "count": 0, "breakdown": {}})
+        point = {
+            "date": b.strftime("%b %Y" if granularity == "month" else "%d %b"),
+            "period": b.isoformat(),
+            "revenue": round(entry["revenue"], 2),
+            "count": entry["count"]
+        }
+        if breakdown:
+            point["breakdown"] = entry["breakdown"]
+        result.append(point)
     return result
 
 @router.get("/top-products")
-def get_top_products(
+async def get_top_products(
     limit: int = 5,
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+    by: str = "quantity",
+    days: int = 30,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    cached: bool = False,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Best-selling products by quantity"""
-    items = db.query(
-        models.SaleItem.product_id,
-        func.sum(models.SaleItem.quantity).label("total_qty"),
-        func.sum(models.SaleItem.subtotal).label("total_revenue")
-    ).join(models.Sale).filter(
-        models.Sale.organization_id == current_user.organization_id
-    ).group_by(models.SaleItem.product_id).order_by(
-        func.sum(models.SaleItem.quantity).desc()
-    ).limit(limit).all()
+    """Best-selling products by quantity, revenue or margin over a time window (default: last 30 days).
 
-    result = []
-    for item in items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        result.append({
-            "product_id": item.product_id,
-            "name": product.name if product else "Unknown",
-            "total_qty": item.total_qty,
-            "total_revenue": round(item.total_revenue, 2)
-        })
-    return result
+    `cached=true` serves a recent result for the same parameters (dashboard use); new sales invalidate it.
+    """
+    if by not in ("quantity", "revenue", "margin"):
+        raise HTTPException(status_code=400, detail="by must be 'quantity', 'revenue' or 'margin'")
+    start, end = _resolve_range(days, start, end)
+    limit = min(max(limit, 1), 100)
+
+    async def compute():
+        qty = func.sum(models.SaleItem.quantity)
+        revenue = func.sum(models.SaleItem.subtotal)
+        # Only lines whose product has a cost price contribute to margin
+        margin = func.sum(models.SaleItem.subtotal - models.SaleItem.quantity * models.Product.cost)
+        sort_col = {"quantity": qty, "revenue": revenue, "margin": margin}[by]
+
+        query = select(
+            models.Product.id,
+            models.Product.name,
+            models.Product.category,
+            qty.label("total_qty"),
+            revenue.label("total_revenue"),
+            margin.label("total_margin")
+        ).select_from(models.SaleItem).join(
+            models.Sale, models.Sale.id == models.SaleItem.sale_id
+        ).join(
+            models.Product, models.Product.id == models.SaleItem.product_id
+        ).where(
+            models.Sale.organization_id == current_user.organization_id,
+            models.Sale.created_at >= day_bounds(start)[0],
+            models.Sale.created_at < day_bounds(end)[1]
+        )
+        if category:
+            query = query.where(models.Product.category == category)
+        rows = (await db.execute(query.group_by(
+            models.Product.id, models.Product.name, models.Product.category
+        ).order_by(sort_col.desc().nulls_last(), models.Product.id).limit(limit))).all()
+
+        return [{
+            "product_id": row.id,
+            "name": row.name,
+            "category": row.category,
+            "total_qty": row.total_qty,
+            "total_revenue": round(row.total_revenue or 0, 2),
+            "total_margin": round(row.total_margin, 2) if row.total_margin is not None else None
+        } for row in rows]
+
+    if not cached:
+        return await compute()
+    key = (current_user.organization_id, "top-products", by, start, end, category, limit)
+    return await analytics_cache.get_or_compute_async(key, compute)
 
 @router.get("/payroll-summary")
-def get_payroll_summary(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+async def get_payroll_summary(
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Overview of payroll costs"""
     now = datetime.utcnow()
-    payslips = db.query(models.Payslip).filter(
+    payslips = (await db.execute(select(models.Payslip).where(
         models.Payslip.organization_id == current_user.organization_id,
         models.Payslip.month == now.month,
         models.Payslip.year == now.year
-    ).all()
+    ))).scalars().all()
 
     total_payroll = sum(p.net_salary for p in payslips)
     total_deductions = sum(p.deductions for p in payslips)
@@ -187,45 +412,72 @@ def get_payroll_summary(
     }
 
 @router.get("/overview")
-def get_dashboard_overview(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+async def get_dashboard_overview(
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Top-level KPI summary for dashboard"""
+    """Top-level KPI summary for dashboard.
+
+    One aggregate-only statement, cached per organization for OVERVIEW_CACHE_TTL
+    seconds and dropped on sale, attendance, staff and product writes.
+    """
+    org_id = current_user.organization_id
+    return await analytics_cache.get_or_compute_async(
+        (org_id, "overview"), lambda: _compute_overview(db, org_id), ttl=OVERVIEW_CACHE_TTL
+    )
+
+async def _compute_overview(db: AsyncSession, org_id: int) -> dict:
     now = datetime.utcnow()
+    today = now.date()
+    month_start = date(now.year, now.month, 1)
+    day_start, day_end = day_bounds(today)  # same UTC day as the rollup's total_sales_today
+    rollup = models.DailySalesRollup
 
     # Staff count
-    staff_count = db.query(models.User).filter(
-        models.User.organization_id == current_user.organization_id,
+    staff_count = select(func.count(models.User.id)).where(
+        models.User.organization_id == org_id,
         models.User.role == "staff"
-    ).count()
+    ).scalar_subquery()
 
     # Today's attendance
-    today_count = db.query(models.Attendance).filter(
-        models.Attendance.organization_id == current_user.organization_id,
-        func.date(models.Attendance.date) == date.today(),
+    today_count = select(func.count(models.Attendance.id)).where(
+        models.Attendance.organization_id == org_id,
+        models.Attendance.date >= day_start,
+        models.Attendance.date < day_end,
         models.Attendance.status.in_(["Present", "Late"])
-    ).count()
+    ).scalar_subquery()
 
-    # This month revenue
-    sales = db.query(models.Sale).filter(
-        models.Sale.organization_id == current_user.organization_id,
-        extract('month', models.Sale.created_at) == now.month,
-        extract('year', models.Sale.created_at) == now.year
-    ).all()
-    monthly_revenue = round(sum(s.total for s in sales), 2)
+    # This month revenue and today's sale count, from the daily rollup
+    month_rollup = [
+        rollup.organization_id == org_id,
+        rollup.day >= month_start,
+        rollup.day < _next_month(month_start)
+    ]
+    monthly_revenue = select(func.coalesce(func.sum(rollup.revenue), 0)).where(*month_rollup).scalar_subquery()
+    sales_today = select(func.coalesce(func.sum(rollup.sale_count), 0)).where(
+        rollup.organization_id == org_id,
+        rollup.day == today
+    ).scalar_subquery()
 
     # Low stock count
-    low_stock = db.query(models.Product).filter(
-        models.Product.organization_id == current_user.organization_id,
+    low_stock = select(func.count(models.Product.id)).where(
+        models.Product.organization_id == org_id,
         models.Product.stock <= 5,
         models.Product.is_active == True
-    ).count()
+    ).scalar_subquery()
+
+    row = (await db.execute(select(
+        staff_count.label("total_staff"),
+        today_count.label("present_today"),
+        monthly_revenue.label("monthly_revenue"),
+        low_stock.label("low_stock_alerts"),
+        sales_today.label("total_sales_today")
+    ))).one()
 
     return {
-        "total_staff": staff_count,
-        "present_today": today_count,
-        "monthly_revenue": monthly_revenue,
-        "low_stock_alerts": low_stock,
-        "total_sales_today": len([s for s in sales if s.created_at.date() == date.today()])
+        "total_staff": row.total_staff,
+        "present_today": row.present_today,
+        "monthly_revenue": round(row.monthly_revenue, 2),
+        "low_stock_alerts": row.low_stock_alerts,
+        "total_sales_today": row.total_sales_today
     }
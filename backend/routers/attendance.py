@@ -1,18 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from datetime import datetime, date
-from typing import List, Optional
-from .. import database, models, schemas, auth
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, case, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Union
+import os
+from .. import database, models, schemas, auth, pagination, bulk
+from ..cache import invalidate_analytics, barcode_cache
+from ..event_bus import bus
+from ..periods import client_time, month_bounds
 
 router = APIRouter(
     prefix="/attendance",
     tags=["attendance"]
 )
 
+# A second scan this soon after check-in is scanner jitter, not a check-out
+SCAN_DEBOUNCE_SECONDS = int(os.getenv("ATTENDANCE_SCAN_DEBOUNCE_SECONDS", "60"))
+MAX_SCAN_BATCH = 1000
+MAX_MARK_BATCH = 1000
+ATTENDANCE_STATUSES = ("Present", "Late", "Absent")
+MATRIX_LEGEND = {"P": "Present", "L": "Late", "A": "Absent", "V": "On leave", ".": "No record"}
+
+def _attendance_event(record: models.Attendance) -> dict:
+    return {
+        "attendance_id": record.id,
+        "user_id": record.user_id,
+        "status": record.status,
+        "check_in_time": record.check_in_time,
+        "check_out_time": record.check_out_time,
+        "marked_by": record.marked_by
+    }
+
+def _publish_attendance(event_type: str, record: models.Attendance):
+    bus.publish(record.organization_id, event_type, _attendance_event(record), user_id=record.user_id)
+
+def _today_record(db: Session, user_id: int, day: date) -> Optional[models.Attendance]:
+    return db.query(models.Attendance).filter(
+        models.Attendance.user_id == user_id,
+        models.Attendance.day == day
+    ).first()
+
 @router.post("/check-in", response_model=schemas.AttendanceResponse)
 def check_in(
     user_id: int,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     """Mark staff check-in time"""
@@ -25,34 +58,40 @@ def check_in(
         raise HTTPException(status_code=404, detail="Staff not found in your organization")
     
     # Check if already checked in today
-    today = date.today()
-    existing = db.query(models.Attendance).filter(
-        models.Attendance.user_id == user_id,
-        models.Attendance.organization_id == current_user.organization_id,
-        models.Attendance.date >= datetime(today.year, today.month, today.day)
-    ).first()
-    
-    if existing and existing.check_in_time:
-        raise HTTPException(status_code=400, detail="Already checked in today")
-    
     now = datetime.utcnow()
-    db_attendance = models.Attendance(
-        user_id=user_id,
-        organization_id=current_user.organization_id,
-        date=now,
-        check_in_time=now,
-        status="Present",
-        marked_by="manual"
-    )
-    db.add(db_attendance)
-    db.commit()
+    db_attendance = _today_record(db, user_id, now.date())
+    if db_attendance and db_attendance.check_in_time:
+        raise HTTPException(status_code=400, detail="Already checked in today")
+
+    if db_attendance:
+        # Marked (e.g. absent) earlier today without a check-in
+        db_attendance.check_in_time = now
+        db_attendance.status = "Present"
+    else:
+        db_attendance = models.Attendance(
+            user_id=user_id,
+            organization_id=current_user.organization_id,
+            date=now,
+            day=now.date(),
+            check_in_time=now,
+            status="Present",
+            marked_by="manual"
+        )
+        db.add(db_attendance)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Already checked in today")
+    invalidate_analytics(current_user.organization_id)
     db.refresh(db_attendance)
+    _publish_attendance("attendance.check_in" if db_attendance.check_in_time else "attendance.marked", db_attendance)
     return db_attendance
 
 @router.post("/check-out/{attendance_id}", response_model=schemas.AttendanceResponse)
 def check_out(
     attendance_id: int,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     """Mark staff check-out time"""
@@ -69,13 +108,24 @@ def check_out(
     
     attendance.check_out_time = datetime.utcnow()
     db.commit()
+    invalidate_analytics(current_user.organization_id)
     db.refresh(attendance)
+    _publish_attendance("attendance.check_out", attendance)
     return attendance
 
+def _set_mark(record: models.Attendance, mark: str, now: datetime):
+    record.status = mark
+    if mark in ["Present", "Late"]:
+        record.check_in_time = record.check_in_time or now
+    else:
+        record.check_in_time = None
+        record.check_out_time = None
+    record.marked_by = "manual"
+
 @router.post("/mark", response_model=schemas.AttendanceResponse)
 def mark_attendance(
     attendance: schemas.AttendanceCreate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     # Check if user exists and belongs to owner's organization
@@ -87,72 +137,367 @@ def mark_attendance(
         raise HTTPException(status_code=404, detail="User not found in your organization")
     
     now = datetime.utcnow()
-    db_attendance = models.Attendance(
-        user_id=attendance.user_id,
-        organization_id=current_user.organization_id,
-        status=attendance.status,
-        date=now,
-        check_in_time=now if attendance.status in ["Present", "Late"] else None,
-        marked_by="manual"
-    )
-    db.add(db_attendance)
-    db.commit()
+    db_attendance = _today_record(db, attendance.user_id, now.date())
+    if db_attendance:
+        # Re-marking the same day corrects today's row instead of adding another
+        _set_mark(db_attendance, attendance.status, now)
+    else:
+        db_attendance = models.Attendance(
+            user_id=attendance.user_id,
+            organization_id=current_user.organization_id,
+            status=attendance.status,
+            date=now,
+            day=now.date(),
+            check_in_time=now if attendance.status in ["Present", "Late"] else None,
+            marked_by="manual"
+        )
+        db.add(db_attendance)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Attendance for this staff member was just recorded; try again")
+    invalidate_analytics(current_user.organization_id)
     db.refresh(db_attendance)
+    _publish_attendance("attendance.check_in" if db_attendance.check_in_time else "attendance.marked", db_attendance)
     return db_attendance
 
+@router.post("/mark-bulk", response_model=List[schemas.AttendanceBulkResult])
+def mark_attendance_bulk(
+    entries: List[schemas.AttendanceCreate],
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: Session = Depends(database.get_db)
+):
+    """Mark a whole roll call in one transaction.
+
+    Staff already marked today have that row corrected; everyone else gets a new
+    row, inserted with one executemany. Unknown staff, unknown statuses and
+    repeated user ids are reported per row and skipped. Results are in request order.
+    """
+    if len(entries) > MAX_MARK_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_MARK_BATCH} entries per request")
+    organization_id = current_user.organization_id
+    now = datetime.utcnow()
+
+    members = {user_id for (user_id,) in db.query(models.User.id).filter(
+        models.User.organization_id == organization_id,
+        models.User.id.in_({entry.user_id for entry in entries})
+    )}
+    existing = {record.user_id: record for record in db.query(models.Attendance).filter(
+        models.Attendance.user_id.in_(members),
+        models.Attendance.day == now.date()
+    ).with_for_update()} if members else {}
+
+    results = [None] * len(entries)
+    first_row, inserts, updated = {}, [], []
+    for i, entry in enumerate(entries):
+        if entry.user_id not in members:
+            error = "Staff not found in your organization"
+        elif entry.status not in ATTENDANCE_STATUSES:
+            error = f"Status must be one of: {', '.join(ATTENDANCE_STATUSES)}"
+        elif entry.user_id in first_row:
+            error = f"Staff member already listed on row {first_row[entry.user_id] + 1}"
+        else:
+            error = None
+        if error:
+            results[i] = {"user_id": entry.user_id, "result": "error", "error": error}
+            continue
+        first_row[entry.user_id] = i
+        record = existing.get(entry.user_id)
+        if record:
+            _set_mark(record, entry.status, now)
+            updated.append((i, record))
+        else:
+            inserts.append((i, {
+                "user_id": entry.user_id,
+                "organization_id": organization_id,
+                "status": entry.status,
+                "date": now,
+                "day": now.date(),
+                "check_in_time": now if entry.status in ["Present", "Late"] else None,
+                "check_out_time": None,
+                "marked_by": "manual"
+            }))
+
+    events = []
+    try:
+        # A concurrent /mark between the locking read and this INSERT trips
+        # uq_attendance_user_day here, before the commit
+        if inserts:
+            # One staff member per row, so returned ids are matched back by user_id
+            new_ids = dict(db.execute(
+                insert(models.Attendance).returning(models.Attendance.user_id, models.Attendance.id),
+                [row for _, row in inserts]
+            ).all())
+            for i, row in inserts:
+                attendance_id = new_ids[row["user_id"]]
+                results[i] = {"user_id": row["user_id"], "result": "created", "attendance_id": attendance_id}
+                events.append((row["user_id"], row["check_in_time"], {
+                    "attendance_id": attendance_id,
+                    **{key: row[key] for key in ("user_id", "status", "check_in_time", "check_out_time", "marked_by")}
+                }))
+        for i, record in updated:
+            results[i] = {"user_id": record.user_id, "result": "updated", "attendance_id": record.id}
+            events.append((record.user_id, record.check_in_time, _attendance_event(record)))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Attendance for some of these staff was just recorded; resend the list")
+
+    if events:
+        invalidate_analytics(organization_id)
+        for user_id, check_in_time, payload in events:
+            bus.publish(organization_id, "attendance.check_in" if check_in_time else "attendance.marked", payload, user_id=user_id)
+    return results
+
+def _resolve_barcodes(db: Session, organization_id: int, codes: list) -> dict:
+    """{barcode: user_id} for codes belonging to the organization, served from barcode_cache when possible"""
+    found, misses = {}, []
+    for code in set(codes):
+        user_id = barcode_cache.get((organization_id, code))
+        if user_id is None:
+            misses.append(code)
+        else:
+            found[code] = user_id
+
+    for chunk in bulk.chunked(misses):
+        for user_id, code in db.query(models.User.id, models.User.barcode).filter(
+            models.User.organization_id == organization_id,
+            models.User.barcode.in_(chunk)
+        ):
+            found[code] = user_id
+    # ID cards printed before staff had barcodes encode the numeric user id
+    legacy = {int(code): code for code in misses if code not in found and code.isdigit()}
+    for chunk in bulk.chunked(list(legacy)):
+        for (user_id,) in db.query(models.User.id).filter(
+            models.User.organization_id == organization_id,
+            models.User.id.in_(chunk)
+        ):
+            found[legacy[user_id]] = user_id
+
+    for code in misses:
+        if code in found:
+            barcode_cache.put((organization_id, code), found[code])
+    return found
+
+def _apply_scan(record: Optional[models.Attendance], organization_id: int, user_id: int, code: str, at: datetime):
+    """Apply one scan to the staff member's row for that day. Returns (record, action).
+
+    The first scan checks in, a later one checks out; anything else (a repeat within
+    SCAN_DEBOUNCE_SECONDS, or after check-out) is a "duplicate" and changes nothing.
+    A new record is returned unsaved.
+    """
+    if record is None:
+        return models.Attendance(
+            user_id=user_id,
+            organization_id=organization_id,
+            status="Present",
+            date=at,
+            day=at.date(),
+            check_in_time=at,
+            marked_by=f"barcode:{code}"
+        ), "check_in"
+    if record.check_in_time is None:
+        record.check_in_time = at
+        record.status = "Present"
+        record.marked_by = f"barcode:{code}"
+        return record, "check_in"
+    if record.check_out_time is None and (at - record.check_in_time).total_seconds() >= SCAN_DEBOUNCE_SECONDS:
+        record.check_out_time = at
+        return record, "check_out"
+    return record, "duplicate"
+
 @router.post("/barcode", response_model=schemas.AttendanceResponse)
 def mark_attendance_barcode(
-    barcode_data: dict, # Expecting {"barcode": "ID"}
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    scan: schemas.BarcodeScan,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
-    barcode_id = barcode_data.get("barcode")
-    if not barcode_id:
+    """Record a scanned staff ID card: first scan of the day checks in, the next checks out.
+
+    Repeat scans within the debounce window, or after check-out, return today's
+    record unchanged.
+    """
+    code = scan.barcode.strip()
+    if not code:
         raise HTTPException(status_code=400, detail="Barcode is required")
-    
-    # Assuming barcode is the User ID for simplicity
-    try:
-        user_id = int(barcode_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid barcode format")
-    
-    # Find user by ID in owner's organization
-    user = db.query(models.User).filter(
-        models.User.id == user_id,
-        models.User.organization_id == current_user.organization_id
-    ).first()
-    
-    if not user:
+    user_id = _resolve_barcodes(db, current_user.organization_id, [code]).get(code)
+    if user_id is None:
         raise HTTPException(status_code=404, detail="User not found in your organization with this barcode")
-    
+
     now = datetime.utcnow()
-    db_attendance = models.Attendance(
-        user_id=user.id,
-        organization_id=current_user.organization_id,
-        status="Present",
-        date=now,
-        check_in_time=now,
-        marked_by=f"barcode:{barcode_id}"
-    )
-    db.add(db_attendance)
-    db.commit()
-    db.refresh(db_attendance)
-    return db_attendance
+    for attempt in range(2):
+        record = _today_record(db, user_id, now.date())
+        record, action = _apply_scan(record, current_user.organization_id, user_id, code, now)
+        if action == "duplicate":
+            return record
+        db.add(record)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # A simultaneous scan created today's row first; apply this scan on top of it
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Scan conflicted with another scan; try again")
 
-@router.get("/all", response_model=List[schemas.AttendanceResponse])
-def get_all_attendance(
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    invalidate_analytics(current_user.organization_id)
+    db.refresh(record)
+    _publish_attendance(f"attendance.{action}", record)
+    return record
+
+@router.post("/barcode/batch", response_model=List[schemas.BarcodeScanResult])
+def mark_attendance_barcode_batch(
+    scans: List[schemas.BarcodeScan],
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
+):
+    """Record scans queued by a kiosk, in one transaction.
+
+    Scans are applied in scanned_at order with the same rules as /barcode, so a
+    replayed queue only produces "duplicate" results. Results are in request order.
+    """
+    if len(scans) > MAX_SCAN_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SCAN_BATCH} scans per batch")
+    organization_id = current_user.organization_id
+    now = datetime.utcnow()
+    codes = [scan.barcode.strip() for scan in scans]
+    times = [client_time(scan.scanned_at, now) for scan in scans]
+    resolved = _resolve_barcodes(db, organization_id, [code for code in codes if code])
+
+    # Every (staff, day) row the batch touches, loaded in one locking query
+    wanted = {(resolved[code], times[i].date()) for i, code in enumerate(codes) if code in resolved}
+    records = {}
+    if wanted:
+        for record in db.query(models.Attendance).filter(
+            models.Attendance.user_id.in_({user_id for user_id, _ in wanted}),
+            models.Attendance.day.in_({day for _, day in wanted})
+        ).with_for_update():
+            records[(record.user_id, record.day)] = record
+
+    results = [None] * len(scans)
+    applied = []
+    for i in sorted(range(len(scans)), key=lambda i: times[i]):
+        code = codes[i]
+        if not code:
+            results[i] = {"barcode": code, "status": "error", "error": "Barcode is required"}
+            continue
+        user_id = resolved.get(code)
+        if user_id is None:
+            results[i] = {"barcode": code, "status": "error", "error": "Unknown barcode"}
+            continue
+        key = (user_id, times[i].date())
+        record, action = _apply_scan(records.get(key), organization_id, user_id, code, times[i])
+        if key not in records:
+            db.add(record)
+            records[key] = record
+        applied.append((i, record, action))
+
+    events = []
+    try:
+        # Flush once so new rows get ids, and snapshot them before commit expires the objects.
+        # A concurrent scan that created the same (staff, day) row fails here, not at commit.
+        db.flush()
+        for i, record, action in applied:
+            results[i] = {"barcode": codes[i], "status": action, "user_id": record.user_id, "attendance_id": record.id}
+            if action != "duplicate":
+                events.append((f"attendance.{action}", record.user_id, _attendance_event(record)))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Some of these scans were recorded concurrently; resend the batch")
+
+    if events:
+        invalidate_analytics(organization_id)
+        for event_type, user_id, payload in events:
+            bus.publish(organization_id, event_type, payload, user_id=user_id)
+    return results
+
+@router.get("/matrix", response_model=schemas.AttendanceMatrix)
+def get_attendance_matrix(
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: Session = Depends(database.get_db)
+):
+    """Staff x day attendance grid for a month (default: current), one character per cell.
+
+    Codes are listed in `legend`. Recorded attendance takes precedence over approved
+    leave, except that an absence on a leave day shows as leave.
+    """
+    today = datetime.utcnow().date()
+    month, year = month or today.month, year or today.year
+    if not 1 <= month <= 12 or year < 1:
+        raise HTTPException(status_code=400, detail="Invalid month or year")
+    start, end = month_bounds(year, month)
+    days = (end - start).days
+    organization_id = current_user.organization_id
+
+    staff = db.query(models.User.id, models.User.username).filter(
+        models.User.organization_id == organization_id,
+        models.User.role == "staff"
+    ).order_by(models.User.username).all()
+    grid = {user_id: ["."] * days for user_id, _ in staff}
+
+    # One grouped pass over the month; the best status wins if a day has several rows
+    att = models.Attendance
+    day_col = func.date(att.date, type_=Date)
+    best = func.min(case((att.status == "Present", 0), (att.status == "Late", 1), (att.status == "Absent", 2), else_=3))
+    for user_id, day, rank in db.query(att.user_id, day_col, best).filter(
+        att.organization_id == organization_id,
+        att.date >= start,
+        att.date < end
+    ).group_by(att.user_id, day_col):
+        cells = grid.get(user_id)
+        if cells is not None and rank < 3:
+            cells[day.day - 1] = "PLA"[rank]
+
+    first_day, last_day = start.date(), (end - timedelta(days=1)).date()
+    for user_id, leave_start, leave_end in db.query(
+        models.Leave.user_id, models.Leave.start_date, models.Leave.end_date
+    ).filter(
+        models.Leave.organization_id == organization_id,
+        models.Leave.status == "approved",
+        models.Leave.start_date < end,
+        models.Leave.end_date >= start
+    ):
+        cells = grid.get(user_id)
+        if cells is None:
+            continue
+        lo = (max(leave_start.date(), first_day) - first_day).days
+        hi = (min(leave_end.date(), last_day) - first_day).days
+        for d in range(lo, hi + 1):
+            if cells[d] in ".A":
+                cells[d] = "V"
+
+    return {
+        "year": year,
+        "month": month,
+        "days": days,
+        "legend": MATRIX_LEGEND,
+        "rows": [{"user_id": user_id, "username": username, "cells": "".join(grid[user_id])} for user_id, username in staff]
+    }
+
+@router.get("/all", response_model=Union[schemas.Page[schemas.AttendanceResponse], List[schemas.AttendanceResponse]])
+async def get_all_attendance(
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     # Filter attendance by organization
-    attendance_records = db.query(models.Attendance).filter(
+    stmt = select(models.Attendance).where(
         models.Attendance.organization_id == current_user.organization_id
-    ).order_by(models.Attendance.date.desc()).all()
-    return attendance_records
+    )
+    if not paginate:
+        # Legacy full list, kept while the frontend moves to cursors
+        return (await db.execute(stmt.order_by(models.Attendance.date.desc()))).scalars().all()
+    return await pagination.paginate_async(db, stmt, [models.Attendance.date, models.Attendance.id], cursor, limit)
 
 @router.get("/my-attendance", response_model=List[schemas.AttendanceResponse])
 def get_my_attendance(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     # Staff can only see their own attendance within their organization
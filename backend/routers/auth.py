@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from .. import database, models, schemas, auth
 from datetime import timedelta, datetime
 import secrets
@@ -10,11 +12,17 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 # ─── Login ───────────────────────────────────────────────────────────────────
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    # Async so a login storm waits on the bcrypt pool without holding request threads
+    # or DB connections: the session is closed before the password check.
+    def lookup():
+        user = db.query(models.User).filter(models.User.username == form_data.username).first()
+        db.close()
+        return user
+    user = await run_in_threadpool(lookup)
+    if not user or not await auth.verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
-    access_token = auth.create_access_token(data={"sub": user.username, "role": user.role}, expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES))
+    access_token = auth.create_user_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
@@ -28,33 +36,50 @@ def check_owner(db: Session = Depends(database.get_db)):
 # ─── Register ────────────────────────────────────────────────────────────────
 
 @router.post("/register-owner", response_model=schemas.UserResponse)
-def register_owner(request: schemas.RegisterOwnerRequest, db: Session = Depends(database.get_db)):
-    if db.query(models.User).filter(models.User.username == request.username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-    if db.query(models.User).filter(models.User.email == request.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered. Please login or use a different email.")
-    if db.query(models.Organization).filter(models.Organization.name == request.organization_name).first():
-        raise HTTPException(status_code=400, detail="Organization name already exists. Please choose a different name.")
+async def register_owner(request: schemas.RegisterOwnerRequest, db: Session = Depends(database.get_db)):
+    # Like login: the checks and the insert run on the threadpool, and the session is
+    # closed while the password is hashed on the bcrypt pool.
+    def check():
+        try:
+            if db.query(models.User).filter(models.User.username == request.username).first():
+                raise HTTPException(status_code=400, detail="Username already exists")
+            if db.query(models.User).filter(models.User.email == request.email).first():
+                raise HTTPException(status_code=400, detail="Email already registered. Please login or use a different email.")
+            if db.query(models.Organization).filter(models.Organization.name == request.organization_name).first():
+                raise HTTPException(status_code=400, detail="Organization name already exists. Please choose a different name.")
+        finally:
+            db.close()
+    await run_in_threadpool(check)
+    password_hash = await auth.get_password_hash_async(request.password)
 
     verify_token = secrets.token_urlsafe(32)
-    new_owner = models.User(
-        username=request.username,
-        email=request.email,
-        password_hash=auth.get_password_hash(request.password),
-        role="owner",
-        organization_id=None,
-        email_verified=False,
-        email_verify_token=verify_token
-    )
-    db.add(new_owner)
-    db.flush()
 
-    new_org = models.Organization(name=request.organization_name, owner_id=new_owner.id)
-    db.add(new_org)
-    db.flush()
-    new_owner.organization_id = new_org.id
-    db.commit()
-    db.refresh(new_owner)
+    def create():
+        new_owner = models.User(
+            username=request.username,
+            email=request.email,
+            password_hash=password_hash,
+            role="owner",
+            organization_id=None,
+            email_verified=False,
+            email_verify_token=verify_token
+        )
+        try:
+            db.add(new_owner)
+            db.flush()
+
+            new_org = models.Organization(name=request.organization_name, owner_id=new_owner.id)
+            db.add(new_org)
+            db.flush()
+            new_owner.organization_id = new_org.id
+            db.commit()
+        except IntegrityError:
+            # Registered concurrently between the checks and the insert
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Username, email or organization name already exists")
+        db.refresh(new_owner)
+        return new_owner
+    new_owner = await run_in_threadpool(create)
 
     try:
         from ..email_service import send_verification_email
@@ -99,36 +124,74 @@ def forgot_password_email(request: schemas.ForgotPasswordEmailRequest, db: Sessi
     return {"message": "If that email is registered, a reset link has been sent."}
 
 @router.post("/reset-password-token")
-def reset_password_token(request: schemas.ResetPasswordTokenRequest, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.reset_token == request.token).first()
-    if not user:
+async def reset_password_token(request: schemas.ResetPasswordTokenRequest, db: Session = Depends(database.get_db)):
+    def lookup():
+        try:
+            user = db.query(models.User).filter(models.User.reset_token == request.token).first()
+            if not user:
+                raise HTTPException(status_code=400, detail="Invalid or expired reset link.")
+            if user.reset_token_expires and datetime.utcnow() > user.reset_token_expires:
+                raise HTTPException(status_code=400, detail="Reset link has expired. Please request a new one.")
+            return user.id
+        finally:
+            db.close()
+    user_id = await run_in_threadpool(lookup)
+    password_hash = await auth.get_password_hash_async(request.new_password)
+
+    def store():
+        # Matching on the token again keeps the link single-use if two resets race
+        updated = db.query(models.User).filter(
+            models.User.id == user_id, models.User.reset_token == request.token
+        ).update({
+            models.User.password_hash: password_hash,
+            models.User.reset_token: None,
+            models.User.reset_token_expires: None,
+        }, synchronize_session=False)
+        db.commit()
+        return updated
+    if not await run_in_threadpool(store):
         raise HTTPException(status_code=400, detail="Invalid or expired reset link.")
-    if user.reset_token_expires and datetime.utcnow() > user.reset_token_expires:
-        raise HTTPException(status_code=400, detail="Reset link has expired. Please request a new one.")
-    user.password_hash = auth.get_password_hash(request.new_password)
-    user.reset_token = None
-    user.reset_token_expires = None
-    db.commit()
+    auth.invalidate_principal(user_id)
     return {"message": "Password reset successfully! You can now login."}
 
+def _store_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.password_hash: password_hash}, synchronize_session=False
+    )
+    db.commit()
+
 # ─── Owner-managed password reset ────────────────────────────────────────────
 
 @router.post("/reset-password", response_model=schemas.PasswordResetResponse)
-def reset_password(request: schemas.PasswordResetRequest, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_owner)):
-    user_to_reset = db.query(models.User).filter(models.User.username == request.username).first()
-    if not user_to_reset:
-        raise HTTPException(status_code=404, detail="User not found")
-    if user_to_reset.organization_id != current_user.organization_id:
-        raise HTTPException(status_code=403, detail="You can only reset passwords for users in your organization")
-    user_to_reset.password_hash = auth.get_password_hash(request.new_password)
-    db.commit()
-    return {"message": "Password successfully reset", "username": user_to_reset.username}
+async def reset_password(request: schemas.PasswordResetRequest, db: Session = Depends(database.get_db), current_user: auth.Principal = Depends(auth.get_current_active_owner)):
+    def lookup():
+        try:
+            user_to_reset = db.query(models.User).filter(models.User.username == request.username).first()
+            if not user_to_reset:
+                raise HTTPException(status_code=404, detail="User not found")
+            if user_to_reset.organization_id != current_user.organization_id:
+                raise HTTPException(status_code=403, detail="You can only reset passwords for users in your organization")
+            return user_to_reset.id
+        finally:
+            db.close()
+    user_id = await run_in_threadpool(lookup)
+    password_hash = await auth.get_password_hash_async(request.new_password)
+    await run_in_threadpool(_store_password_hash, db, user_id, password_hash)
+    auth.invalidate_principal(user_id)
+    return {"message": "Password successfully reset", "username": request.username}
 
 @router.post("/self-reset-password", response_model=schemas.PasswordResetResponse)
-def self_reset_password(request: schemas.PasswordResetRequest, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == request.username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Username not found")
-    user.password_hash = auth.get_password_hash(request.new_password)
-    db.commit()
-    return {"message": "Password successfully reset", "username": user.username}
+async def self_reset_password(request: schemas.PasswordResetRequest, db: Session = Depends(database.get_db)):
+    def lookup():
+        try:
+            user = db.query(models.User).filter(models.User.username == request.username).first()
+            if not user:
+                raise HTTPException(status_code=404, detail="Username not found")
+            return user.id
+        finally:
+            db.close()
+    user_id = await run_in_threadpool(lookup)
+    password_hash = await auth.get_password_hash_async(request.new_password)
+    await run_in_threadpool(_store_password_hash, db, user_id, password_hash)
+    auth.invalidate_principal(user_id)
+    return {"message": "Password successfully reset", "username": request.username}
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+from .. import database, auth
+from ..event_bus import bus
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+HEARTBEAT_SECONDS = 15
+
+def _format_sse(event: dict) -> str:
+    payload = json.dumps({"data": event["data"], "at": event["at"]}, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+@router.get("/stream")
+async def stream_events(request: Request, token: Optional[str] = None):
+    """Server-Sent Events feed of live changes for the caller's organization.
+
+    Owners receive every event (attendance.check_in, attendance.check_out,
+    sale.created, stock.low, message.new); staff receive only events about
+    themselves. Browsers' EventSource cannot set headers, so the JWT may be
+    passed as ?token= instead of an Authorization header.
+    """
+    header = request.headers.get("Authorization", "")
+    if header.lower().startswith("bearer "):
+        token = header[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+    # Resolve the user up front on a short-lived session so the stream holds no DB connection
+    def resolve_user():
+        db = database.SessionLocal()
+        try:
+            return auth.get_current_user(token, db)
+        finally:
+            db.close()
+    current_user = await run_in_threadpool(resolve_user)
+
+    sub = bus.subscribe(current_user.organization_id, current_user.id, current_user.role == "owner")
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from typing import Optional
+import csv
+import io
+import json
+from .. import database, models, auth
+from ..periods import day_bounds
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+BATCH_SIZE = 1000  # rows fetched per round trip (server-side cursor on PostgreSQL)
+
+def _attendance_query(db, org_id: int, start: Optional[date], end: Optional[date]):
+    att = models.Attendance
+    query = db.query(
+        att.id, att.user_id, models.User.username, att.date, att.status,
+        att.check_in_time, att.check_out_time, att.marked_by
+    ).outerjoin(models.User, models.User.id == att.user_id).filter(att.organization_id == org_id)
+    if start:
+        query = query.filter(att.date >= day_bounds(start)[0])
+    if end:
+        query = query.filter(att.date < day_bounds(end)[1])
+    return query.order_by(att.id)
+
+def _sales_query(db, org_id: int, start: Optional[date], end: Optional[date]):
+    sale = models.Sale
+    query = db.query(
+        sale.id, sale.created_at, sale.customer_name, sale.sold_by, sale.subtotal,
+        sale.discount, sale.tax, sale.total, sale.payment_method
+    ).filter(sale.organization_id == org_id)
+    if start:
+        query = query.filter(sale.created_at >= day_bounds(start)[0])
+    if end:
+        query = query.filter(sale.created_at < day_bounds(end)[1])
+    return query.order_by(sale.id)
+
+def _sale_items_query(db, org_id: int, start: Optional[date], end: Optional[date]):
+    item = models.SaleItem
+    query = db.query(
+        item.id, item.sale_id, models.Sale.created_at, item.product_id, models.Product.name.label("product_name"),
+        item.quantity, item.unit_price, item.subtotal
+    ).join(models.Sale, models.Sale.id == item.sale_id).outerjoin(
+        models.Product, models.Product.id == item.product_id
+    ).filter(models.Sale.organization_id == org_id)
+    if start:
+        query = query.filter(models.Sale.created_at >= day_bounds(start)[0])
+    if end:
+        query = query.filter(models.Sale.created_at < day_bounds(end)[1])
+    return query.order_by(item.id)
+
+def _payslips_query(db, org_id: int, start: Optional[date], end: Optional[date]):
+    slip = models.Payslip
+    query = db.query(
+        slip.id, slip.user_id, models.User.username, slip.year, slip.month, slip.base_salary,
+        slip.days_present, slip.days_late, slip.days_absent, slip.deductions, slip.net_salary, slip.generated_at
+    ).outerjoin(models.User, models.User.id == slip.user_id).filter(slip.organization_id == org_id)
+    # Payslips belong to a pay period, so the range selects months rather than timestamps
+    period = slip.year * 100 + slip.month
+    if start:
+        query = query.filter(period >= start.year * 100 + start.month)
+    if end:
+        query = query.filter(period <= end.year * 100 + end.month)
+    return query.order_by(slip.id)
+
+DATASETS = {
+    "attendance": _attendance_query,
+    "sales": _sales_query,
+    "sale_items": _sale_items_query,
+    "payslips": _payslips_query,
+}
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _stream_rows(dataset: str, fmt: str, org_id: int, start: Optional[date], end: Optional[date]):
+    # Own session: the request's dependency session may be closed before streaming finishes
+    db = database.SessionLocal()
+    try:
+        query = DATASETS[dataset](db, org_id, start, end).yield_per(BATCH_SIZE)
+        columns = [c["name"] for c in query.column_descriptions]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+
+        for n, row in enumerate(query, start=1):
+            if writer:
+                writer.writerow([_plain(v) for v in row])
+            else:
+                buffer.write(json.dumps(dict(zip(columns, map(_plain, row)))) + "\n")
+            if n % BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+@router.get("/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner)
+):
+    """Stream attendance, sales, sale_items or payslips as CSV or NDJSON in constant memory"""
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{dataset}'. Choose from: {', '.join(DATASETS)}")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{dataset}{'_' + start.isoformat() if start else ''}{'_' + end.isoformat() if end else ''}.{format}"
+    return StreamingResponse(
+        _stream_rows(dataset, format, current_user.organization_id, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
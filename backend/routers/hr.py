@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, case, and_, select
 from datetime import datetime
-from typing import List
-from .. import database, models, schemas, auth
+import calendar
+from typing import List, Optional, Union
+from .. import database, models, schemas, auth, pagination
+from ..periods import month_bounds
 
 router = APIRouter(prefix="/hr", tags=["HR & Payroll"])
 
@@ -12,7 +15,7 @@ router = APIRouter(prefix="/hr", tags=["HR & Payroll"])
 @router.post("/salary/set", response_model=schemas.SalaryResponse)
 def set_salary(
     data: schemas.SalaryCreate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     """Owner sets or updates a staff member's salary"""
@@ -46,7 +49,7 @@ def set_salary(
 
 @router.get("/salary/all", response_model=List[schemas.SalaryResponse])
 def get_all_salaries(
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     return db.query(models.Salary).filter(
@@ -55,7 +58,7 @@ def get_all_salaries(
 
 @router.get("/salary/me", response_model=schemas.SalaryResponse)
 def get_my_salary(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     salary = db.query(models.Salary).filter(models.Salary.user_id == current_user.id).first()
@@ -68,7 +71,7 @@ def get_my_salary(
 @router.post("/leave/apply", response_model=schemas.LeaveResponse)
 def apply_leave(
     data: schemas.LeaveCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     """Staff applies for leave"""
@@ -86,19 +89,25 @@ def apply_leave(
     db.refresh(leave)
     return leave
 
-@router.get("/leave/all", response_model=List[schemas.LeaveResponse])
-def get_all_leaves(
-    current_user: models.User = Depends(auth.get_current_active_owner),
-    db: Session = Depends(database.get_db)
+@router.get("/leave/all", response_model=Union[schemas.Page[schemas.LeaveResponse], List[schemas.LeaveResponse]])
+async def get_all_leaves(
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Owner views all leave requests"""
-    return db.query(models.Leave).filter(
+    stmt = select(models.Leave).where(
         models.Leave.organization_id == current_user.organization_id
-    ).order_by(models.Leave.applied_at.desc()).all()
+    )
+    if not paginate:
+        return (await db.execute(stmt.order_by(models.Leave.applied_at.desc()))).scalars().all()
+    return await pagination.paginate_async(db, stmt, [models.Leave.applied_at, models.Leave.id], cursor, limit)
 
 @router.get("/leave/my", response_model=List[schemas.LeaveResponse])
 def get_my_leaves(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     return db.query(models.Leave).filter(
@@ -109,7 +118,7 @@ def get_my_leaves(
 def review_leave(
     leave_id: int,
     data: schemas.LeaveStatusUpdate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     """Owner approves or rejects leave"""
@@ -129,15 +138,40 @@ def review_leave(
 
 # ─── PAYSLIP ENDPOINTS ───────────────────────────────────────────────────────
 
+def _working_days(year: int, month: int) -> int:
+    return len([
+        d for d in range(1, calendar.monthrange(year, month)[1] + 1)
+        if datetime(year, month, d).weekday() < 6  # Mon–Sat
+    ])
+
+def _salary_after_deductions(base_salary: float, days_absent: int, days_late: int, year: int, month: int):
+    """Deduct 1 day per absent, 0.5 per late. Returns (deductions, net_salary)."""
+    per_day = base_salary / max(_working_days(year, month), 1)
+    deductions = round((days_absent * per_day) + (days_late * per_day * 0.5), 2)
+    return deductions, round(base_salary - deductions, 2)
+
+def _status_counts():
+    """Present/Late/Absent counts as conditional aggregates over Attendance"""
+    return [
+        func.sum(case((models.Attendance.status == s, 1), else_=0)).label(label)
+        for s, label in (("Present", "present"), ("Late", "late"), ("Absent", "absent"))
+    ]
+
+def _check_period(month: int, year: int):
+    if not 1 <= month <= 12 or year < 1:
+        raise HTTPException(status_code=400, detail="Invalid month or year")
+
+
 @router.post("/payslip/generate", response_model=schemas.PayslipResponse)
 def generate_payslip(
     user_id: int,
     month: int,
     year: int,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     """Generate monthly payslip for a staff member"""
+    _check_period(month, year)
     staff = db.query(models.User).filter(
         models.User.id == user_id,
         models.User.organization_id == current_user.organization_id
@@ -159,26 +193,15 @@ def generate_payslip(
         return existing
 
     # Count attendance for the month
-    from sqlalchemy import extract
-    records = db.query(models.Attendance).filter(
+    month_start, month_end = month_bounds(year, month)
+    counts = db.query(*_status_counts()).filter(
         models.Attendance.user_id == user_id,
-        extract('month', models.Attendance.date) == month,
-        extract('year', models.Attendance.date) == year
-    ).all()
-
-    days_present = sum(1 for r in records if r.status == "Present")
-    days_late = sum(1 for r in records if r.status == "Late")
-    days_absent = sum(1 for r in records if r.status == "Absent")
+        models.Attendance.date >= month_start,
+        models.Attendance.date < month_end
+    ).one()
 
-    # Calculate: deduct 1 day per absent, 0.5 per late
-    import calendar
-    total_working_days = len([
-        d for d in range(1, calendar.monthrange(year, month)[1] + 1)
-        if datetime(year, month, d).weekday() < 6  # Mon–Sat
-    ])
-    per_day = salary_rec.base_salary / max(total_working_days, 1)
-    deductions = round((days_absent * per_day) + (days_late * per_day * 0.5), 2)
-    net_salary = round(salary_rec.base_salary - deductions, 2)
+    days_present, days_late, days_absent = counts.present or 0, counts.late or 0, counts.absent or 0
+    deductions, net_salary = _salary_after_deductions(salary_rec.base_salary, days_absent, days_late, year, month)
 
     payslip = models.Payslip(
         user_id=user_id,
@@ -197,18 +220,115 @@ def generate_payslip(
     db.refresh(payslip)
     return payslip
 
-@router.get("/payslip/all", response_model=List[schemas.PayslipResponse])
-def get_all_payslips(
-    current_user: models.User = Depends(auth.get_current_active_owner),
+@router.post("/payslip/generate-batch")
+def generate_payslips_batch(
+    month: int,
+    year: int,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
-    return db.query(models.Payslip).filter(
+    """Generate missing payslips for every staff member in the organization in one transaction.
+
+    Safe to re-run: staff who already have a payslip for the month are skipped.
+    """
+    _check_period(month, year)
+    org_id = current_user.organization_id
+    month_start, month_end = month_bounds(year, month)
+
+    counts = db.query(models.Attendance.user_id, *_status_counts()).filter(
+        models.Attendance.organization_id == org_id,
+        models.Attendance.date >= month_start,
+        models.Attendance.date < month_end
+    ).group_by(models.Attendance.user_id).subquery()
+
+    staff_rows = db.query(
+        models.User.id,
+        models.User.username,
+        models.Salary.base_salary,
+        counts.c.present,
+        counts.c.late,
+        counts.c.absent,
+        models.Payslip.id.label("payslip_id")
+    ).outerjoin(
+        models.Salary, models.Salary.user_id == models.User.id
+    ).outerjoin(
+        counts, counts.c.user_id == models.User.id
+    ).outerjoin(
+        models.Payslip, and_(
+            models.Payslip.user_id == models.User.id,
+            models.Payslip.month == month,
+            models.Payslip.year == year
+        )
+    ).filter(
+        models.User.organization_id == org_id,
+        models.User.role == "staff"
+    ).all()
+
+    new_payslips = []
+    already_generated = 0
+    missing_salary = []
+    for row in staff_rows:
+        if row.payslip_id is not None:
+            already_generated += 1
+            continue
+        if row.base_salary is None:
+            missing_salary.append(row.username)
+            continue
+        days_present, days_late, days_absent = row.present or 0, row.late or 0, row.absent or 0
+        deductions, net_salary = _salary_after_deductions(row.base_salary, days_absent, days_late, year, month)
+        new_payslips.append({
+            "user_id": row.id,
+            "organization_id": org_id,
+            "month": month,
+            "year": year,
+            "base_salary": row.base_salary,
+            "days_present": days_present,
+            "days_absent": days_absent,
+            "days_late": days_late,
+            "deductions": deductions,
+            "net_salary": net_salary,
+            "generated_at": datetime.utcnow()
+        })
+
+    generated = 0
+    if new_payslips:
+        # A concurrent run may have inserted some of these already; the unique
+        # (user_id, year, month) index turns those into no-ops
+        stmt = database.dialect_insert(db)(models.Payslip).on_conflict_do_nothing(
+            index_elements=["user_id", "year", "month"]
+        ).returning(models.Payslip.id)
+        generated = len(db.execute(stmt, new_payslips).all())
+    db.commit()
+
+    return {
+        "month": month,
+        "year": year,
+        "total_staff": len(staff_rows),
+        "generated": generated,
+        "already_generated": already_generated,
+        "missing_salary": missing_salary
+    }
+
+@router.get("/payslip/all", response_model=Union[schemas.Page[schemas.PayslipResponse], List[schemas.PayslipResponse]])
+async def get_all_payslips(
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    stmt = select(models.Payslip).where(
         models.Payslip.organization_id == current_user.organization_id
-    ).order_by(models.Payslip.year.desc(), models.Payslip.month.desc()).all()
+    )
+    if not paginate:
+        return (await db.execute(stmt.order_by(models.Payslip.year.desc(), models.Payslip.month.desc()))).scalars().all()
+    # Keyed on the pay period rather than a timestamp to keep the existing newest-period-first order
+    keys = [models.Payslip.year, models.Payslip.month, models.Payslip.id]
+    return await pagination.paginate_async(db, stmt, keys, cursor, limit)
 
 @router.get("/payslip/my", response_model=List[schemas.PayslipResponse])
 def get_my_payslips(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     return db.query(models.Payslip).filter(
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-from .. import database, models, schemas, auth
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from typing import List, Optional, Union
+from .. import database, models, schemas, auth, pagination
+from ..event_bus import bus
 from datetime import datetime
 
 router = APIRouter(
@@ -9,10 +12,20 @@ router = APIRouter(
     tags=["message"]
 )
 
+def _publish_message(msg: models.Message):
+    bus.publish(msg.organization_id, "message.new", {
+        "message_id": msg.id,
+        "sender_id": msg.sender_id,
+        "receiver_id": msg.receiver_id,
+        "type": msg.type,
+        "message": msg.message,
+        "timestamp": msg.timestamp
+    }, user_id=msg.receiver_id)
+
 @router.post("/send", response_model=schemas.MessageResponse)
 def send_message(
     msg: schemas.MessageCreate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     # Owner can only send to users in their organization
@@ -34,12 +47,13 @@ def send_message(
     db.add(db_msg)
     db.commit()
     db.refresh(db_msg)
+    _publish_message(db_msg)
     return db_msg
 
 @router.post("/reply", response_model=schemas.MessageResponse)
 def reply_message(
     msg: schemas.MessageBase, # Only message content needed
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     if current_user.role == "owner":
@@ -64,24 +78,94 @@ def reply_message(
     db.add(db_msg)
     db.commit()
     db.refresh(db_msg)
+    _publish_message(db_msg)
     return db_msg
 
-@router.get("/inbox", response_model=List[schemas.MessageResponse])
-def get_inbox(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+async def _received_messages(
+    db: AsyncSession,
+    response: Response,
+    current_user: auth.Principal,
+    cursor: Optional[str],
+    limit: int,
+    paginate: bool,
+    since_id: Optional[int]
 ):
-    return db.query(models.Message).filter(
+    stmt = select(models.Message).where(
         models.Message.receiver_id == current_user.id,
         models.Message.organization_id == current_user.organization_id
-    ).all()
+    )
+    if since_id is not None:
+        # Incremental fetch: only messages newer than the last one the client has, oldest first.
+        # One extra row tells whether the client must ask again from the last id returned.
+        limit = min(max(limit, 1), pagination.MAX_LIMIT)
+        items = (await db.execute(
+            stmt.where(models.Message.id > since_id).order_by(models.Message.id).limit(limit + 1)
+        )).scalars().all()
+        next_since_id = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_since_id = items[-1].id
+            # The legacy list form has no envelope, so the continuation goes in a header
+            response.headers["X-Next-Since-Id"] = str(next_since_id)
+        return items if not paginate else {"items": items, "next_cursor": None, "next_since_id": next_since_id}
+    if not paginate:
+        return (await db.execute(stmt)).scalars().all()
+    return await pagination.paginate_async(db, stmt, [models.Message.timestamp, models.Message.id], cursor, limit)
+
+@router.get("/inbox", response_model=Union[schemas.MessagePage, List[schemas.MessageResponse]])
+async def get_inbox(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    since_id: Optional[int] = None,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await _received_messages(db, response, current_user, cursor, limit, paginate, since_id)
+
+@router.get("/replies", response_model=Union[schemas.MessagePage, List[schemas.MessageResponse]])
+async def get_replies(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    since_id: Optional[int] = None,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await _received_messages(db, response, current_user, cursor, limit, paginate, since_id)
 
-@router.get("/replies", response_model=List[schemas.MessageResponse])
-def get_replies(
-    current_user: models.User = Depends(auth.get_current_active_owner),
+@router.get("/unread-count", response_model=schemas.UnreadCountResponse)
+async def get_unread_count(
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Unread messages for the caller, answered from the (receiver_id, read_at) index"""
+    row = (await db.execute(select(
+        func.count(models.Message.id).label("unread"),
+        func.max(models.Message.id).label("latest_unread_id")
+    ).where(
+        models.Message.receiver_id == current_user.id,
+        models.Message.read_at.is_(None)
+    ))).one()
+    return {"unread": row.unread, "latest_unread_id": row.latest_unread_id}
+
+@router.post("/read")
+def mark_read(
+    data: schemas.MarkReadRequest,
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    return db.query(models.Message).filter(
+    """Mark received messages as read, either by id or everything up to up_to_id"""
+    query = db.query(models.Message).filter(
         models.Message.receiver_id == current_user.id,
-        models.Message.organization_id == current_user.organization_id
-    ).all()
+        models.Message.read_at.is_(None)
+    )
+    if data.message_ids is not None:
+        query = query.filter(models.Message.id.in_(data.message_ids))
+    if data.up_to_id is not None:
+        query = query.filter(models.Message.id <= data.up_to_id)
+    updated = query.update({models.Message.read_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return {"marked_read": updated}
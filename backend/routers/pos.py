@@ -1,23 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select, update, case, or_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Union
 from datetime import datetime
-from .. import database, models, schemas, auth
+from .. import database, models, schemas, auth, rollups, pagination, bulk
+from ..cache import invalidate_analytics
+from ..periods import client_time
+from ..event_bus import bus
 
 router = APIRouter(prefix="/pos", tags=["POS"])
 
+LOW_STOCK_THRESHOLD = 5
+
+MAX_SEARCH_RESULTS = 100
+MAX_SALE_BATCH = 500
+
 # ─── PRODUCT ENDPOINTS ───────────────────────────────────────────────────────
 
+def _clean_sku(sku: Optional[str]) -> Optional[str]:
+    """Blank SKUs are stored as NULL so they don't collide on the unique (organization_id, sku) index"""
+    sku = (sku or "").strip()
+    return sku or None
+
+def _commit_product(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="A product with this SKU already exists")
+
 @router.post("/product", response_model=schemas.ProductResponse)
 def add_product(
     data: schemas.ProductCreate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     product = models.Product(
         organization_id=current_user.organization_id,
         name=data.name,
-        sku=data.sku,
+        sku=_clean_sku(data.sku),
         category=data.category,
         price=data.price,
         cost=data.cost,
@@ -25,13 +49,14 @@ def add_product(
         unit=data.unit
     )
     db.add(product)
-    db.commit()
+    _commit_product(db)
+    invalidate_analytics(current_user.organization_id)
     db.refresh(product)
     return product
 
 @router.get("/product/all", response_model=List[schemas.ProductResponse])
 def get_all_products(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
     return db.query(models.Product).filter(
@@ -42,7 +67,7 @@ def get_all_products(
 @router.get("/product/low-stock", response_model=List[schemas.ProductResponse])
 def get_low_stock(
     threshold: int = 5,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     return db.query(models.Product).filter(
@@ -51,11 +76,62 @@ def get_low_stock(
         models.Product.is_active == True
     ).all()
 
+def _like_pattern(term: str, prefix_only: bool) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+@router.get("/product/search", response_model=List[schemas.ProductResponse])
+def search_products(
+    q: str,
+    limit: int = 20,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Search active products by name or SKU for the till.
+
+    Results are ranked exact SKU first, then prefix matches, then substring matches.
+    On PostgreSQL the ILIKE filters use the pg_trgm GIN indexes; on SQLite they scan
+    only this organization's rows via the (organization_id, sku) index.
+    """
+    term = q.strip()
+    if not term:
+        raise HTTPException(status_code=400, detail="Search term is required")
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    product = models.Product
+    contains, prefix = _like_pattern(term, False), _like_pattern(term, True)
+    rank = case(
+        (product.sku == term, 0),
+        (or_(product.name.ilike(prefix, escape="\\"), product.sku.ilike(prefix, escape="\\")), 1),
+        else_=2
+    )
+    return db.query(product).filter(
+        product.organization_id == current_user.organization_id,
+        product.is_active == True,
+        or_(product.name.ilike(contains, escape="\\"), product.sku.ilike(contains, escape="\\"))
+    ).order_by(rank, product.name, product.id).limit(limit).all()
+
+@router.get("/product/barcode/{code}", response_model=schemas.ProductResponse)
+def get_product_by_barcode(
+    code: str,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Exact lookup of a scanned barcode (the product's SKU): one probe of the unique (organization_id, sku) index"""
+    product = db.query(models.Product).filter(
+        models.Product.organization_id == current_user.organization_id,
+        models.Product.sku == code.strip(),
+        models.Product.is_active == True
+    ).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="No product with this barcode")
+    return product
+
 @router.patch("/product/{product_id}", response_model=schemas.ProductResponse)
 def update_product(
     product_id: int,
     data: schemas.ProductUpdate,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     product = db.query(models.Product).filter(
@@ -64,16 +140,20 @@ def update_product(
     ).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    stock_before = {product.id: product.stock}
     for field, value in data.dict(exclude_unset=True).items():
-        setattr(product, field, value)
-    db.commit()
+        setattr(product, field, _clean_sku(value) if field == "sku" else value)
+    now_low = _low_stock_crossings([product], stock_before) if product.is_active else []
+    _commit_product(db)
+    invalidate_analytics(current_user.organization_id)
     db.refresh(product)
+    _publish_low_stock(current_user.organization_id, now_low)
     return product
 
 @router.delete("/product/{product_id}")
 def delete_product(
     product_id: int,
-    current_user: models.User = Depends(auth.get_current_active_owner),
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
     product = db.query(models.Product).filter(
@@ -84,38 +164,266 @@ def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
     product.is_active = False  # Soft delete
     db.commit()
+    invalidate_analytics(current_user.organization_id)
     return {"message": "Product removed"}
 
-# ─── SALES ENDPOINTS ─────────────────────────────────────────────────────────
+def _low_stock_crossings(products, stock_before: dict) -> list:
+    """Products that just dropped to LOW_STOCK_THRESHOLD or below (read before commit expires them)"""
+    return [
+        {"product_id": p.id, "name": p.name, "stock": p.stock}
+        for p in products
+        if p.stock <= LOW_STOCK_THRESHOLD < stock_before[p.id]
+    ]
 
-@router.post("/sale", response_model=schemas.SaleResponse)
-def create_sale(
-    data: schemas.SaleCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+def _publish_low_stock(organization_id: int, crossings: list):
+    for product in crossings:
+        bus.publish(organization_id, "stock.low", product)
+
+# ─── BULK IMPORT ENDPOINTS ───────────────────────────────────────────────────
+
+def _upsert_products(db: Session, organization_id: int, rows) -> dict:
+    received, errors, valid = 0, [], {}
+    for row_no, fields in rows:
+        received += 1
+        item, error = bulk.parse_row(schemas.ProductImportRow, fields)
+        if item:
+            item.sku = item.sku.strip()
+            if not item.sku:
+                error = "sku is required"
+            elif item.sku in valid:
+                error = f"Duplicate sku '{item.sku}' (also on row {valid[item.sku][0]})"
+            elif (item.price is not None and item.price < 0) or (item.stock is not None and item.stock < 0):
+                error = "price and stock cannot be negative"
+        if error:
+            errors.append({"row": row_no, "error": error})
+            continue
+        valid[item.sku] = (row_no, item)
+
+    # Resolve every uploaded sku to an existing product in a few IN queries
+    existing = {}
+    for chunk in bulk.chunked(list(valid)):
+        for product_id, sku, name, stock in db.query(
+            models.Product.id, models.Product.sku, models.Product.name, models.Product.stock
+        ).filter(
+            models.Product.organization_id == organization_id,
+            models.Product.sku.in_(chunk)
+        ).order_by(models.Product.id):
+            existing.setdefault(sku, (product_id, name, stock))
+
+    inserts, updates, now_low = [], [], []
+    created_at = datetime.utcnow()
+    for sku, (row_no, item) in valid.items():
+        fields = item.dict(exclude_unset=True, exclude_none=True, exclude={"sku"})
+        if sku in existing:
+            product_id, name, stock_before = existing[sku]
+            # Re-importing a removed product brings it back
+            updates.append({"id": product_id, **fields, "is_active": True})
+            stock = fields.get("stock", stock_before)
+            if stock <= LOW_STOCK_THRESHOLD < stock_before:
+                now_low.append({"product_id": product_id, "name": fields.get("name", name), "stock": stock})
+            continue
+        if item.name is None or item.price is None:
+            errors.append({"row": row_no, "error": "name and price are required for a new sku"})
+            continue
+        inserts.append((frozenset(fields), {
+            "organization_id": organization_id,
+            "name": item.name,
+            "sku": sku,
+            "category": item.category,
+            "price": item.price,
+            "cost": item.cost,
+            "stock": item.stock or 0,
+            "unit": item.unit or "pcs",
+            "is_active": True,
+            "created_at": created_at
+        }))
+
+    # executemany: INSERT ... ON CONFLICT (organization_id, sku) for new skus and one
+    # UPDATE-by-primary-key statement for known ones. A sku created concurrently after the
+    # lookup is updated in place with the columns its row provided; rows are grouped by
+    # those columns so a missing stock or unit never overwrites the existing value.
+    inserted = 0
+    table = models.Product.__table__
+    groups = {}
+    for provided, values in inserts:
+        groups.setdefault(provided, []).append(values)
+    for provided, group in groups.items():
+        stmt = database.dialect_insert(db)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.organization_id, table.c.sku],
+            set_={**{name: stmt.excluded[name] for name in provided}, "is_active": True}
+        ).returning(table.c.created_at)
+        # Updated rows keep their original created_at
+        inserted += sum(1 for (row_created,) in db.execute(stmt, group) if row_created == created_at)
+    if updates:
+        db.execute(update(models.Product), updates)
+    db.commit()
+    errors.sort(key=lambda e: e["row"])
+    return {"received": received, "inserted": inserted, "updated": len(updates) + len(inserts) - inserted,
+            "errors": errors, "now_low": now_low}
+
+def _adjust_stock(db: Session, organization_id: int, rows) -> dict:
+    received, errors, parsed = 0, [], []
+    for row_no, fields in rows:
+        received += 1
+        item, error = bulk.parse_row(schemas.StockAdjustRow, fields)
+        if item:
+            if (item.product_id is None) == (item.sku is None):
+                error = "Give exactly one of product_id or sku"
+            elif (item.delta is None) == (item.stock is None):
+                error = "Give exactly one of delta or stock"
+            elif item.stock is not None and item.stock < 0:
+                error = "stock cannot be negative"
+        if error:
+            errors.append({"row": row_no, "error": error})
+            continue
+        parsed.append((row_no, item))
+
+    # Load and lock every referenced product up front, in id order per chunk
+    by_id, by_sku = {}, {}
+    ids = list({item.product_id for _, item in parsed if item.product_id is not None})
+    skus = list({item.sku for _, item in parsed if item.sku is not None})
+    columns = (models.Product.id, models.Product.sku, models.Product.name, models.Product.stock)
+    for column, values in ((models.Product.id, ids), (models.Product.sku, skus)):
+        for chunk in bulk.chunked(values):
+            for product_id, sku, name, stock in db.query(*columns).filter(
+                models.Product.organization_id == organization_id,
+                column.in_(chunk)
+            ).order_by(models.Product.id).with_for_update():
+                by_id[product_id] = {"name": name, "stock": stock, "before": stock}
+                by_sku.setdefault(sku, product_id)
+
+    # Rows apply in upload order, so a count followed by a correction behaves as expected
+    for row_no, item in parsed:
+        product_id = item.product_id if item.product_id is not None else by_sku.get(item.sku)
+        product = by_id.get(product_id)
+        if not product:
+            errors.append({"row": row_no, "error": f"Product {item.product_id if item.product_id is not None else item.sku!r} not found"})
+            continue
+        stock = item.stock if item.stock is not None else product["stock"] + item.delta
+        if stock < 0:
+            errors.append({"row": row_no, "error": f"Adjustment would leave {product['name']} with negative stock ({stock})"})
+            continue
+        product["stock"] = stock
+
+    changed = [(pid, p) for pid, p in by_id.items() if p["stock"] != p["before"]]
+    if changed:
+        db.execute(update(models.Product), [{"id": pid, "stock": p["stock"]} for pid, p in changed])
+    db.commit()
+    errors.sort(key=lambda e: e["row"])
+    now_low = [
+        {"product_id": pid, "name": p["name"], "stock": p["stock"]}
+        for pid, p in changed if p["stock"] <= LOW_STOCK_THRESHOLD < p["before"]
+    ]
+    return {"received": received, "updated": len(changed), "errors": errors, "now_low": now_low}
+
+@router.post("/product/bulk", response_model=schemas.BulkResult)
+async def bulk_upsert_products(
+    request: Request,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
     db: Session = Depends(database.get_db)
 ):
-    """Create a new sale/invoice"""
-    subtotal = 0.0
-    sale_items = []
+    """Create or update many products by sku from a JSON array or a CSV upload (header row required).
+
+    Valid rows are written; invalid rows are skipped and listed in `errors` with their row number.
+    """
+    rows = await bulk.read_rows(request)
+    result = await run_in_threadpool(_upsert_products, db, current_user.organization_id, rows)
+    invalidate_analytics(current_user.organization_id)
+    _publish_low_stock(current_user.organization_id, result.pop("now_low"))
+    return result
+
+@router.post("/stock/adjust-bulk", response_model=schemas.BulkResult)
+async def bulk_adjust_stock(
+    request: Request,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: Session = Depends(database.get_db)
+):
+    """Apply many stock changes at once (stock take or delivery) from a JSON array or CSV.
+
+    Each row names a product by `product_id` or `sku` and gives either `delta`
+    (added to current stock) or `stock` (the counted quantity).
+    """
+    rows = await bulk.read_rows(request)
+    result = await run_in_threadpool(_adjust_stock, db, current_user.organization_id, rows)
+    invalidate_analytics(current_user.organization_id)
+    _publish_low_stock(current_user.organization_id, result.pop("now_low"))
+    return result
+
+# ─── SALES ENDPOINTS ─────────────────────────────────────────────────────────
 
-    for item_data in data.items:
-        product = db.query(models.Product).filter(
-            models.Product.id == item_data.product_id,
-            models.Product.organization_id == current_user.organization_id
-        ).first()
+def _sum_quantities(items: List[schemas.SaleItemCreate]) -> dict:
+    """{product_id: total quantity}; lines for the same product are summed"""
+    wanted = {}
+    for item in items:
+        wanted[item.product_id] = wanted.get(item.product_id, 0) + item.quantity
+    return wanted
+
+def _lock_product_rows(db: Session, organization_id: int, product_ids) -> dict:
+    """Load products in one query, row-locked until commit, in id order so concurrent tills cannot deadlock"""
+    products = db.query(models.Product).filter(
+        models.Product.id.in_(product_ids),
+        models.Product.organization_id == organization_id
+    ).order_by(models.Product.id).with_for_update().all()
+    return {p.id: p for p in products}
+
+def _lock_products(db: Session, organization_id: int, items: List[schemas.SaleItemCreate]):
+    """Load every product on an invoice in one query, row-locked until commit, and check stock.
+
+    Returns {product_id: Product}. Lines for the same product are summed before the
+    stock check.
+    """
+    if any(item.quantity <= 0 for item in items):
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    wanted = _sum_quantities(items)
+    by_id = _lock_product_rows(db, organization_id, wanted)
+
+    for product_id, quantity in wanted.items():
+        product = by_id.get(product_id)
         if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item_data.product_id} not found")
-        if product.stock < item_data.quantity:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        if product.stock < quantity:
             raise HTTPException(status_code=400, detail=f"Insufficient stock for {product.name}")
+    return by_id
 
+def _price_lines(items: List[schemas.SaleItemCreate], products: dict):
+    """Sale item rows at current prices, and the invoice subtotal"""
+    subtotal = 0.0
+    sale_items = []
+    for item_data in items:
+        product = products[item_data.product_id]
         item_subtotal = product.price * item_data.quantity
         subtotal += item_subtotal
         sale_items.append({
-            "product": product,
+            "product_id": product.id,
             "quantity": item_data.quantity,
             "unit_price": product.price,
             "subtotal": item_subtotal
         })
+    return sale_items, subtotal
+
+def _publish_sale(organization_id: int, sale_id: int, total: float, payment_method: str,
+                  item_count: int, sold_by: int, created_at: datetime):
+    bus.publish(organization_id, "sale.created", {
+        "sale_id": sale_id,
+        "total": total,
+        "payment_method": payment_method,
+        "item_count": item_count,
+        "sold_by": sold_by,
+        "created_at": created_at
+    })
+
+@router.post("/sale", response_model=schemas.SaleResponse)
+def create_sale(
+    data: schemas.SaleCreate,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Create a new sale/invoice"""
+    if not data.items:
+        raise HTTPException(status_code=400, detail="Sale must have at least one item")
+    products = _lock_products(db, current_user.organization_id, data.items)
+    sale_items, subtotal = _price_lines(data.items, products)
 
     total = round(subtotal - data.discount + data.tax, 2)
 
@@ -132,38 +440,193 @@ def create_sale(
     db.add(sale)
     db.flush()
 
+    stock_before = {p.id: p.stock for p in products.values()}
     for item in sale_items:
-        si = models.SaleItem(
-            sale_id=sale.id,
-            product_id=item["product"].id,
-            quantity=item["quantity"],
-            unit_price=item["unit_price"],
-            subtotal=item["subtotal"]
-        )
-        db.add(si)
-        # Deduct stock
-        item["product"].stock -= item["quantity"]
+        item["sale_id"] = sale.id
+        # Deduct stock (rows are locked by _lock_products)
+        products[item["product_id"]].stock -= item["quantity"]
+    db.execute(insert(models.SaleItem), sale_items)
+    now_low = _low_stock_crossings(products.values(), stock_before)
 
+    rollups.record_sale(db, sale)
     db.commit()
+    invalidate_analytics(current_user.organization_id)
     db.refresh(sale)
+    _publish_sale(sale.organization_id, sale.id, sale.total, sale.payment_method,
+                  len(sale_items), sale.sold_by, sale.created_at)
+    _publish_low_stock(current_user.organization_id, now_low)
     return sale
 
-@router.get("/sale/all", response_model=List[schemas.SaleResponse])
-def get_all_sales(
-    current_user: models.User = Depends(auth.get_current_active_owner),
+@router.post("/sale/batch", response_model=List[schemas.SaleBatchResult])
+def sync_sales(
+    data: List[schemas.SaleBatchItem],
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    return db.query(models.Sale).filter(
+    """Record sales queued by a terminal while offline, in one transaction.
+
+    Each sale carries a client-generated idempotency_key. Keys that were already
+    recorded, or repeat within the batch, come back as "duplicate" with the
+    original sale id, so a terminal can resend a whole batch after a dropped
+    connection. A sale that cannot be recorded (unknown product, not enough
+    stock) comes back as "error"; the rest of the batch is still recorded.
+    Results are in request order.
+    """
+    if len(data) > MAX_SALE_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SALE_BATCH} sales per batch")
+    organization_id = current_user.organization_id
+    results = [None] * len(data)
+    keys = [sale_data.idempotency_key.strip() for sale_data in data]
+
+    def result(i, status, sale_id=None, total=None, error=None):
+        results[i] = {"idempotency_key": keys[i], "status": status, "sale_id": sale_id, "total": total, "error": error}
+
+    existing = {}
+    for chunk in bulk.chunked(list({key for key in keys if key})):
+        for sale_id, key, total in db.query(models.Sale.id, models.Sale.idempotency_key, models.Sale.total).filter(
+            models.Sale.organization_id == organization_id,
+            models.Sale.idempotency_key.in_(chunk)
+        ):
+            existing[key] = (sale_id, total)
+
+    pending, first_index, repeats = [], {}, []
+    for i, sale_data in enumerate(data):
+        key = keys[i]
+        if not key:
+            result(i, "error", error="idempotency_key is required")
+        elif key in existing:
+            result(i, "duplicate", *existing[key])
+        elif key in first_index:
+            repeats.append(i)
+        elif not sale_data.items:
+            first_index[key] = i
+            result(i, "error", error="Sale must have at least one item")
+        elif any(item.quantity <= 0 for item in sale_data.items):
+            first_index[key] = i
+            result(i, "error", error="Quantity must be positive")
+        else:
+            first_index[key] = i
+            pending.append(i)
+
+    # One locking read for every product in the batch; stock is then checked and
+    # deducted sale by sale in request order, and flushed as one batched UPDATE
+    products = _lock_product_rows(db, organization_id, {
+        item.product_id for i in pending for item in data[i].items
+    }) if pending else {}
+    stock_before = {p.id: p.stock for p in products.values()}
+    now = datetime.utcnow()
+    new_sales = []
+    for i in pending:
+        sale_data = data[i]
+        wanted = _sum_quantities(sale_data.items)
+        missing = [product_id for product_id in wanted if product_id not in products]
+        if missing:
+            result(i, "error", error=f"Product {missing[0]} not found")
+            continue
+        short = [products[product_id].name for product_id, quantity in wanted.items() if products[product_id].stock < quantity]
+        if short:
+            result(i, "error", error=f"Insufficient stock for {short[0]}")
+            continue
+        for product_id, quantity in wanted.items():
+            products[product_id].stock -= quantity
+
+        sale_items, subtotal = _price_lines(sale_data.items, products)
+        new_sales.append((i, {
+            "organization_id": organization_id,
+            "idempotency_key": keys[i],
+            "sold_by": current_user.id,
+            "customer_name": sale_data.customer_name,
+            "subtotal": round(subtotal, 2),
+            "discount": sale_data.discount,
+            "tax": sale_data.tax,
+            "total": round(subtotal - sale_data.discount + sale_data.tax, 2),
+            "payment_method": sale_data.payment_method,
+            "created_at": client_time(sale_data.sold_at, now)
+        }, sale_items))
+
+    created = []
+    try:
+        if new_sales:
+            # ON CONFLICT DO NOTHING: keys another terminal recorded after the duplicate read
+            # above are skipped rather than failing the batch; RETURNING lists only the rows
+            # inserted here, matched back by key so the INSERT runs as one multi-row statement
+            stmt = database.dialect_insert(db)(models.Sale).on_conflict_do_nothing(
+                index_elements=[models.Sale.organization_id, models.Sale.idempotency_key]
+            ).returning(models.Sale.idempotency_key, models.Sale.id)
+            id_by_key = dict(db.execute(stmt, [row for _, row, _ in new_sales]).all())
+
+            raced = []
+            lines = []
+            for i, row, sale_items in new_sales:
+                sale_id = id_by_key.get(row["idempotency_key"])
+                if sale_id is None:
+                    raced.append(i)
+                    # Not recorded here, so give back the stock deducted for it
+                    for product_id, quantity in _sum_quantities(data[i].items).items():
+                        products[product_id].stock += quantity
+                    continue
+                for item in sale_items:
+                    item["sale_id"] = sale_id
+                lines.extend(sale_items)
+                created.append((sale_id, row, sale_items))
+                result(i, "created", sale_id, row["total"])
+            if lines:
+                db.execute(insert(models.SaleItem), lines)
+            rollups.record_sales(db, [row for _, row, _ in created])
+
+            if raced:
+                for sale_id, key, total in db.query(models.Sale.id, models.Sale.idempotency_key, models.Sale.total).filter(
+                    models.Sale.organization_id == organization_id,
+                    models.Sale.idempotency_key.in_([keys[i] for i in raced])
+                ):
+                    existing[key] = (sale_id, total)
+                for i in raced:
+                    result(i, "duplicate", *existing[keys[i]])
+        now_low = _low_stock_crossings(products.values(), stock_before)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Some of these sales were recorded concurrently; resend the batch")
+
+    for i in repeats:
+        first = results[first_index[keys[i]]]
+        if first["status"] == "error":
+            result(i, "error", error=first["error"])
+        else:
+            result(i, "duplicate", first["sale_id"], first["total"])
+
+    if created:
+        invalidate_analytics(organization_id)
+        for sale_id, row, sale_items in created:
+            _publish_sale(organization_id, sale_id, row["total"], row["payment_method"],
+                          len(sale_items), row["sold_by"], row["created_at"])
+        _publish_low_stock(organization_id, now_low)
+    return results
+
+@router.get("/sale/all", response_model=Union[schemas.Page[schemas.SaleResponse], List[schemas.SaleResponse]])
+async def get_all_sales(
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_LIMIT,
+    paginate: bool = True,
+    current_user: auth.Principal = Depends(auth.get_current_active_owner),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    # Items are fetched for the whole page in one extra SELECT ... IN, not one per sale
+    # (eager loading is also required on AsyncSession, which cannot lazy-load)
+    stmt = select(models.Sale).options(selectinload(models.Sale.items)).where(
         models.Sale.organization_id == current_user.organization_id
-    ).order_by(models.Sale.created_at.desc()).all()
+    )
+    if not paginate:
+        return (await db.execute(stmt.order_by(models.Sale.created_at.desc()))).scalars().all()
+    return await pagination.paginate_async(db, stmt, [models.Sale.created_at, models.Sale.id], cursor, limit)
 
 @router.get("/sale/{sale_id}", response_model=schemas.SaleResponse)
 def get_sale(
     sale_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    sale = db.query(models.Sale).filter(
+    sale = db.query(models.Sale).options(selectinload(models.Sale.items)).filter(
         models.Sale.id == sale_id,
         models.Sale.organization_id == current_user.organization_id
     ).first()
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from .. import database, models, schemas, auth
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional, Union
+from .. import database, models, schemas, auth, pagination
+from ..cache import invalidate_analytics, invalidate_barcodes
 import uuid
 
 router = APIRouter(
@@ -10,28 +16,41 @@ router = APIRouter(
 )
 
 @router.post("/add", response_model=schemas.UserResponse)
-def add_staff(staff: schemas.UserCreate, current_user: models.User = Depends(auth.get_current_active_owner), db: Session = Depends(database.get_db)):
+async def add_staff(staff: schemas.UserCreate, current_user: auth.Principal = Depends(auth.get_current_active_owner), db: Session = Depends(database.get_db)):
     """Add staff to the current owner's organization"""
-    # Check if username already exists
-    db_user = db.query(models.User).filter(models.User.username == staff.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
+    # Check if username already exists; the session is closed while the password is hashed
+    def check():
+        try:
+            if db.query(models.User).filter(models.User.username == staff.username).first():
+                raise HTTPException(status_code=400, detail="Username already registered")
+        finally:
+            db.close()
+    await run_in_threadpool(check)
+    hashed_password = await auth.get_password_hash_async(staff.password)
+
     # Create staff and assign to owner's organization
-    hashed_password = auth.get_password_hash(staff.password)
-    db_staff = models.User(
-        username=staff.username,
-        password_hash=hashed_password,
-        role="staff",
-        organization_id=current_user.organization_id
-    )
-    db.add(db_staff)
-    db.commit()
-    db.refresh(db_staff)
+    def create():
+        db_staff = models.User(
+            username=staff.username,
+            password_hash=hashed_password,
+            role="staff",
+            barcode=uuid.uuid4().hex[:12].upper(),  # printed on the staff ID card for attendance scans
+            organization_id=current_user.organization_id
+        )
+        db.add(db_staff)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Username already registered")
+        db.refresh(db_staff)
+        return db_staff
+    db_staff = await run_in_threadpool(create)
+    invalidate_analytics(current_user.organization_id)
     return db_staff
 
 @router.delete("/delete/{user_id}")
-def delete_staff(user_id: int, current_user: models.User = Depends(auth.get_current_active_owner), db: Session = Depends(database.get_db)):
+def delete_staff(user_id: int, current_user: auth.Principal = Depends(auth.get_current_active_owner), db: Session = Depends(database.get_db)):
     """Delete staff from owner's organization"""
     # Only allow deletion of staff in the same organization
     db_staff = db.query(models.User).filter(
@@ -43,12 +62,18 @@ def delete_staff(user_id: int, current_user: models.User = Depends(auth.get_curr
         raise HTTPException(status_code=404, detail="Staff not found in your organization")
     db.delete(db_staff)
     db.commit()
+    invalidate_analytics(current_user.organization_id)
+    invalidate_barcodes(current_user.organization_id)
+    auth.invalidate_principal(user_id)
     return {"message": "Staff deleted successfully"}
 
-@router.get("/all", response_model=list[schemas.UserResponse])
-def get_all_staff(current_user: models.User = Depends(auth.get_current_active_owner), db: Session = Depends(database.get_db)):
-    """Get all staff in the owner's organization"""
-    return db.query(models.User).filter(
+@router.get("/all", response_model=Union[schemas.Page[schemas.UserResponse], List[schemas.UserResponse]])
+async def get_all_staff(cursor: Optional[str] = None, limit: int = pagination.DEFAULT_LIMIT, paginate: bool = True, current_user: auth.Principal = Depends(auth.get_current_active_owner), db: AsyncSession = Depends(database.get_async_db)):
+    """Get staff in the owner's organization, newest first (pass paginate=false for the full list)"""
+    stmt = select(models.User).where(
         models.User.role == "staff",
         models.User.organization_id == current_user.organization_id
-    ).all()
+    )
+    if not paginate:
+        return (await db.execute(stmt)).scalars().all()
+    return await pagination.paginate_async(db, stmt, [models.User.created_at, models.User.id], cursor, limit)
@@ -1,7 +1,14 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Generic, TypeVar
 from datetime import datetime
 
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """One page of a cursor-paginated listing; pass next_cursor back as ?cursor= for the next page"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 class UserBase(BaseModel):
     username: str
     email: Optional[str] = None
@@ -44,6 +51,35 @@ class AttendanceResponse(AttendanceBase):
     class Config:
         from_attributes = True
 
+class AttendanceBulkResult(BaseModel):
+    user_id: int
+    result: str  # created, updated, error
+    attendance_id: Optional[int] = None
+    error: Optional[str] = None
+
+class AttendanceMatrixRow(BaseModel):
+    user_id: int
+    username: str
+    cells: str  # one status code per day of the month
+
+class AttendanceMatrix(BaseModel):
+    year: int
+    month: int
+    days: int
+    legend: dict
+    rows: List[AttendanceMatrixRow]
+
+class BarcodeScan(BaseModel):
+    barcode: str
+    scanned_at: Optional[datetime] = None  # set by kiosks replaying queued scans
+
+class BarcodeScanResult(BaseModel):
+    barcode: str
+    status: str  # check_in, check_out, duplicate, error
+    user_id: Optional[int] = None
+    attendance_id: Optional[int] = None
+    error: Optional[str] = None
+
 class MessageBase(BaseModel):
     message: str
     type: str = "normal"
@@ -56,9 +92,23 @@ class MessageResponse(MessageBase):
     sender_id: int
     receiver_id: int
     timestamp: datetime
+    read_at: Optional[datetime] = None
     class Config:
         from_attributes = True
 
+class MessagePage(Page[MessageResponse]):
+    """Inbox page. With ?since_id=, next_since_id is set when more new messages remain;
+    pass it back as since_id to fetch them."""
+    next_since_id: Optional[int] = None
+
+class UnreadCountResponse(BaseModel):
+    unread: int
+    latest_unread_id: Optional[int] = None
+
+class MarkReadRequest(BaseModel):
+    message_ids: Optional[List[int]] = None   # omit to mark everything up to up_to_id (or all) as read
+    up_to_id: Optional[int] = None
+
 class RegisterOwnerRequest(BaseModel):
     username: str
     email: str
@@ -171,6 +221,33 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductImportRow(BaseModel):
+    """One row of /pos/product/bulk; matched to existing products by sku"""
+    sku: str
+    name: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    cost: Optional[float] = None
+    stock: Optional[int] = None
+    unit: Optional[str] = None
+
+class StockAdjustRow(BaseModel):
+    """One row of /pos/stock/adjust-bulk: identify by product_id or sku, give delta or counted stock"""
+    product_id: Optional[int] = None
+    sku: Optional[str] = None
+    delta: Optional[int] = None
+    stock: Optional[int] = None
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkResult(BaseModel):
+    received: int
+    inserted: int = 0
+    updated: int = 0
+    errors: List[BulkRowError] = []
+
 class SaleItemCreate(BaseModel):
     product_id: int
     quantity: int
@@ -182,6 +259,18 @@ class SaleCreate(BaseModel):
     tax: float = 0.0
     payment_method: str = "cash"
 
+class SaleBatchItem(SaleCreate):
+    """A sale queued on a terminal; the key is generated client-side (e.g. a UUID)"""
+    idempotency_key: str
+    sold_at: Optional[datetime] = None
+
+class SaleBatchResult(BaseModel):
+    idempotency_key: str
+    status: str  # created, duplicate, error
+    sale_id: Optional[int] = None
+    total: Optional[float] = None
+    error: Optional[str] = None
+
 class SaleItemResponse(BaseModel):
     id: int
     product_id: int
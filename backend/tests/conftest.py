@@ -0,0 +1,56 @@
+"""
+Shared fixtures. The app reads DATABASE_URL at import time, so it is pointed
+at a throwaway SQLite file here before anything from `backend` is imported.
+Set TEST_DATABASE_URL to run against PostgreSQL instead.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="shop-erp-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from backend import database, models
+from backend.main import app
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+@pytest.fixture(scope="session")
+def owner(client):
+    """Registered owner: (organization_id, auth headers)"""
+    r = client.post("/auth/register-owner", json={
+        "username": "owner", "email": "owner@example.com", "password": "pw", "organization_name": "Test Shop"
+    })
+    assert r.status_code == 200, r.text
+    token = client.post("/auth/login", data={"username": "owner", "password": "pw"}).json()["access_token"]
+    return r.json()["organization_id"], {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def statements():
+    """SQL statements sent through the database engines while the fixture is active"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    # Async handlers run on async_engine when DB_ASYNC is enabled; its events fire on the sync facade
+    engines = [database.engine]
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
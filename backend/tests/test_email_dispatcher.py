@@ -0,0 +1,102 @@
+"""EmailDispatcher against a local SMTP sink: messages arrive, share a connection, and stop() drains the queue."""
+import socketserver
+import threading
+import time
+from email import message_from_string
+import pytest
+from backend import email_service
+
+class _SMTPSink(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib.sendmail; keeps every message it accepts"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.delay = delay
+        self.messages = []
+        self.connections = 0
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink ready")
+        envelope = {}
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                envelope = {"from": line.split(":", 1)[1].strip("<> "), "to": []}
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(line.split(":", 1)[1].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in self.rfile:
+                    text = raw.decode().rstrip("\r\n")
+                    if text == ".":
+                        break
+                    data.append(text[1:] if text.startswith("..") else text)
+                time.sleep(self.server.delay)
+                envelope["data"] = "\n".join(data)
+                self.server.messages.append(envelope)
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    def start(delay: float = 0.0):
+        server = _SMTPSink(delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(email_service, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(email_service, "SMTP_PORT", server.server_address[1])
+        monkeypatch.setattr(email_service, "SMTP_USE_SSL", False)
+        monkeypatch.setattr(email_service, "SMTP_EMAIL", "shop@example.com")
+        monkeypatch.setattr(email_service, "SMTP_PASSWORD", "")
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_messages_arrive_over_one_connection(smtp_sink):
+    sink = smtp_sink()
+    dispatcher = email_service.EmailDispatcher(workers=1, max_retries=0)
+    for n in range(3):
+        assert dispatcher.enqueue(f"user{n}@example.com", f"Subject {n}", f"<p>Body {n}</p>")
+    dispatcher.stop()
+
+    assert [m["to"] for m in sink.messages] == [[f"user{n}@example.com"] for n in range(3)]
+    assert all(m["from"] == "shop@example.com" for m in sink.messages)
+    assert message_from_string(sink.messages[0]["data"])["Subject"] == "Subject 0"
+    assert sink.connections == 1
+    assert dispatcher.stats == {"sent": 3, "failed": 0, "retried": 0, "connections": 1}
+
+def test_stop_drains_the_queue(smtp_sink):
+    sink = smtp_sink(delay=0.05)
+    dispatcher = email_service.EmailDispatcher(workers=1, max_retries=0, batch_size=2)
+    for n in range(6):
+        dispatcher.enqueue(f"user{n}@example.com", "Queued", "<p>queued</p>")
+    assert dispatcher.pending() > 0  # the slow sink keeps most of them waiting
+
+    dispatcher.stop()
+
+    assert dispatcher.pending() == 0
+    assert len(sink.messages) == 6
+    assert dispatcher.stats["sent"] == 6
@@ -0,0 +1,54 @@
+"""Sale listings load line items eagerly: the statement count must not grow with the number of sales."""
+from datetime import datetime, timedelta
+import pytest
+from backend import models
+
+def _seed_sales(db, organization_id: int, count: int):
+    product = models.Product(organization_id=organization_id, name="Listing test", price=5, stock=0)
+    db.add(product)
+    db.flush()
+    start = datetime.utcnow() - timedelta(days=1)
+    for n in range(count):
+        sale = models.Sale(
+            organization_id=organization_id, customer_name="Walk-in", subtotal=10, discount=0, tax=0,
+            total=10, payment_method="cash", created_at=start + timedelta(seconds=n)
+        )
+        sale.items = [
+            models.SaleItem(product_id=product.id, quantity=1, unit_price=5, subtotal=5),
+            models.SaleItem(product_id=product.id, quantity=1, unit_price=5, subtotal=5),
+        ]
+        db.add(sale)
+    db.commit()
+
+def _clear_sales(db, organization_id: int):
+    sale_ids = db.query(models.Sale.id).filter(models.Sale.organization_id == organization_id)
+    db.query(models.SaleItem).filter(models.SaleItem.sale_id.in_(sale_ids)).delete(synchronize_session=False)
+    db.query(models.Sale).filter(models.Sale.organization_id == organization_id).delete(synchronize_session=False)
+    db.commit()
+
+def _count_statements(client, headers, statements, url: str, expected_sales: int) -> int:
+    client.get(url, headers=headers)  # warm the principal cache so auth adds no lookups
+    statements.clear()
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    sales = body["items"] if isinstance(body, dict) else body
+    assert len(sales) == expected_sales
+    assert all(len(sale["items"]) == 2 for sale in sales)
+    return len(statements)
+
+@pytest.mark.parametrize("url, page_size", [
+    ("/pos/sale/all?paginate=false", None),
+    ("/pos/sale/all?limit=200", 200),
+])
+def test_sale_listing_statement_count_is_constant(client, owner, db, statements, url, page_size):
+    organization_id, headers = owner
+    counts = []
+    for n in (3, 150):
+        _clear_sales(db, organization_id)
+        _seed_sales(db, organization_id, n)
+        expected = n if page_size is None else min(n, page_size)
+        counts.append(_count_statements(client, headers, statements, url, expected))
+    _clear_sales(db, organization_id)
+    assert all(counts), f"no statements recorded; is the listing on an engine the fixture misses? {counts}"
+    assert counts[0] == counts[1], f"statement count grew with the number of sales: {counts}"
@@ -38,7 +38,7 @@ export default function AnalyticsManager({ token }) {
                 axios.get(`${API_BASE_URL}/analytics/attendance`, { headers }),
                 axios.get(`${API_BASE_URL}/analytics/attendance/daily?days=14`, { headers }),
                 axios.get(`${API_BASE_URL}/analytics/sales/daily?days=14`, { headers }),
-                axios.get(`${API_BASE_URL}/analytics/top-products`, { headers }),
+                axios.get(`${API_BASE_URL}/analytics/top-products?cached=true`, { headers }),
                 axios.get(`${API_BASE_URL}/analytics/staff-performance`, { headers }),
                 axios.get(`${API_BASE_URL}/analytics/payroll-summary`, { headers }),
             ])
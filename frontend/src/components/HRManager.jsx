@@ -29,10 +29,10 @@ export default function HRManager({ token }) {
     const fetchAll = async () => {
         try {
             const [staffRes, salRes, leaveRes, slipRes] = await Promise.all([
-                axios.get(`${API_BASE_URL}/staff/all`, { headers }),
+                axios.get(`${API_BASE_URL}/staff/all?paginate=false`, { headers }),
                 axios.get(`${API_BASE_URL}/hr/salary/all`, { headers }),
-                axios.get(`${API_BASE_URL}/hr/leave/all`, { headers }),
-                axios.get(`${API_BASE_URL}/hr/payslip/all`, { headers }),
+                axios.get(`${API_BASE_URL}/hr/leave/all?paginate=false`, { headers }),
+                axios.get(`${API_BASE_URL}/hr/payslip/all?paginate=false`, { headers }),
             ])
             setStaff(staffRes.data)
             setSalaries(salRes.data)
@@ -29,7 +29,7 @@ export default function POSManager({ token }) {
         try {
             const [pRes, sRes] = await Promise.all([
                 axios.get(`${API_BASE_URL}/pos/product/all`, { headers }),
-                axios.get(`${API_BASE_URL}/pos/sale/all`, { headers }),
+                axios.get(`${API_BASE_URL}/pos/sale/all?paginate=false`, { headers }),
             ])
             setProducts(pRes.data)
             setSales(sRes.data)
@@ -65,7 +65,7 @@ const StaffManager = ({ token }) => {
 
     const fetchStaff = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/staff/all`, {
+            const res = await axios.get(`${API_BASE_URL}/staff/all?paginate=false`, {
                 headers: { Authorization: `Bearer ${token}` }
             })
             setStaff(res.data)
@@ -193,7 +193,7 @@ const AttendanceManager = ({ token }) => {
 
     const fetchAttendance = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/attendance/all`, {
+            const res = await axios.get(`${API_BASE_URL}/attendance/all?paginate=false`, {
                 headers: { Authorization: `Bearer ${token}` }
             })
             setAttendance(res.data)
@@ -202,7 +202,7 @@ const AttendanceManager = ({ token }) => {
 
     const fetchStaff = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/staff/all`, {
+            const res = await axios.get(`${API_BASE_URL}/staff/all?paginate=false`, {
                 headers: { Authorization: `Bearer ${token}` }
             })
             setStaff(res.data)
@@ -356,7 +356,7 @@ const MessageManager = ({ token }) => {
 
     const fetchReplies = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/message/replies`, {
+            const res = await axios.get(`${API_BASE_URL}/message/replies?paginate=false`, {
                 headers: { Authorization: `Bearer ${token}` }
             })
             setReplies(res.data)
@@ -18,7 +18,7 @@ const StaffDashboard = () => {
 
     const fetchStaffData = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/staff/all`, {
+            const res = await axios.get(`${API_BASE_URL}/staff/all?paginate=false`, {
                 headers: { Authorization: `Bearer ${user?.token}` }
             })
             const currentStaff = res.data.find(s => s.username === user.username)
@@ -138,7 +138,7 @@ const MyMessages = ({ token }) => {
 
     const fetchInbox = async () => {
         try {
-            const res = await axios.get(`${API_BASE_URL}/message/inbox`, {
+            const res = await axios.get(`${API_BASE_URL}/message/inbox?paginate=false`, {
                 headers: { Authorization: `Bearer ${token}` }
             })
             setInbox(res.data)